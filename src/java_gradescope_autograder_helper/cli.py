@@ -1,11 +1,25 @@
 import argparse
 from os import environ
+from pathlib import Path
 from sys import exit, stdout
 from traceback import print_exc
 
-from .helpers import ConfigurationError, load_env
+from .helpers import (
+    RESULTS_DIR,
+    ConfigurationError,
+    find_absolute_path,
+    load_env,
+)
+from .history import print_stats
 from .init_autograder import init_autograder
-from .run_autograder import run_autograder
+from .run_autograder import (
+    calibrate_timeouts,
+    plan_autograder,
+    run_autograder,
+    write_results,
+)
+from .sharding import merge_shards, parse_shard
+from .watch import watch_autograder
 from .zip_autograder import zip_autograder
 
 load_env()
@@ -27,8 +41,29 @@ def main():
         if args.command == "init":
             init_autograder()
 
+        elif args.command == "run" and args.watch:
+            if args.shard is not None:
+                raise ConfigurationError(
+                    "The --watch and --shard options cannot be used together."
+                )
+
+            watch_autograder(args.path)
+
         elif args.command == "run":
-            run_autograder(args.path)
+            shard = None if args.shard is None else parse_shard(args.shard)
+            run_autograder(args.path, shard=shard)
+
+        elif args.command == "calibrate":
+            calibrate_timeouts(args.path)
+
+        elif args.command == "plan":
+            plan_autograder(args.path)
+
+        elif args.command == "merge":
+            write_results(merge_shards(find_shard_results(args.files)))
+
+        elif args.command == "stats":
+            print_stats(args.runs, args.limit)
 
         elif args.command == "zip":
             zip_autograder()
@@ -59,6 +94,21 @@ def main():
         exit(1)
 
 
+def find_shard_results(files: list[str]) -> list[str]:
+    """
+    Returns the given shard results files, or the ones in the results
+    directory when none are given.
+    """
+
+    if files:
+        return files
+
+    results_dir = Path(find_absolute_path(RESULTS_DIR))
+    return [
+        str(path) for path in sorted(results_dir.glob("shard_*_of_*.json"))
+    ]
+
+
 def setup_arg_parser():
     """
     Set up the argument parser for the command-line interface.
@@ -85,6 +135,61 @@ def setup_arg_parser():
     run_parser.add_argument(
         "path", help="Name of the autograder tests Python module to execute"
     )
+    run_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and regrade whenever the source or submission files change",
+    )
+    run_parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="Only run the I-th of N balanced parts of the tests, e.g. 1/4, and write partial results for `autograder merge`",
+    )
+
+    # Calibrate command
+    calibrate_parser = subparsers.add_parser(
+        "calibrate",
+        help="Time the reference solution for a TIMEOUT_POLICY calibration",
+    )
+    calibrate_parser.add_argument(
+        "path", help="Name of the autograder tests Python module to calibrate"
+    )
+
+    # Plan command
+    plan_parser = subparsers.add_parser(
+        "plan",
+        help="Validate the tests once and write a plan that `autograder run` loads instead",
+    )
+    plan_parser.add_argument(
+        "path", help="Name of the autograder tests Python module to plan"
+    )
+
+    # Merge command
+    merge_parser = subparsers.add_parser(
+        "merge", help="Merge the partial results of sharded runs"
+    )
+    merge_parser.add_argument(
+        "files",
+        nargs="*",
+        help="Partial results files, by default every shard results file in the results directory",
+    )
+
+    # Stats command
+    stats_parser = subparsers.add_parser(
+        "stats", help="Report test and stage times from the run history"
+    )
+    stats_parser.add_argument(
+        "--runs",
+        type=int,
+        default=None,
+        help="Only consider the latest RUNS runs (default: all runs)",
+    )
+    stats_parser.add_argument(
+        "--limit",
+        type=int,
+        default=10,
+        help="Number of slowest tests to show (default: 10)",
+    )
 
     # Zip command
     subparsers.add_parser(
@@ -1,30 +1,102 @@
 from pathlib import Path
 from subprocess import run
+from typing import Iterable
 
 from .helpers import ConfigurationError
 
 
-def compile_java(entry_point_path: str, classpath: str | None) -> None:
+def compile_java(
+    entry_point_path: str,
+    classpath: str | None,
+    output_dir: str | None = None,
+    extra_classes: Iterable[str] = (),
+) -> None:
     """
-    Compiles all Java source files found recursively from the directory of
-    the given entry point.
+    Compiles the entry point, the classes it uses, and `extra_classes` into
+    `output_dir`, or in place without one. If javac cannot find a class by its
+    file name, every Java source file under the entry point's directory is
+    compiled instead.
 
     Raises:
-        Exception: If the compilation process fails, an Exception is raised
-            with the corresponding error message from stderr.
+        ConfigurationError: If the compilation process fails, with the
+            corresponding error message from stderr.
     """
 
     cmd = ["javac"]
     if classpath:
         cmd.extend(["-cp", classpath])
 
-    # Recursively find all .java files
     entry_point_dir = Path(entry_point_path).parent
-    java_files = list(entry_point_dir.rglob("*.java"))
+    if output_dir is None:
+        # Recursively find all .java files
+        java_files = list(entry_point_dir.rglob("*.java"))
+
+    else:
+        cmd.extend(["-sourcepath", str(entry_point_dir), "-d", output_dir])
+        java_files = [Path(entry_point_path)]
+        for class_name in extra_classes:
+            # Nested classes are defined in their outer class's file
+            outer_class_name = class_name.split("$")[0]
+            java_file = entry_point_dir / (
+                outer_class_name.replace(".", "/") + ".java"
+            )
+            if java_file.exists() and java_file not in java_files:
+                java_files.append(java_file)
+
     cmd.extend([str(java_file) for java_file in java_files])
+    if output_dir is None:
+        run_javac(cmd, entry_point_dir)
+        return
+
+    try:
+        run_javac(cmd, entry_point_dir)
+
+    except ConfigurationError as error:
+        try:
+            compile_java_files(
+                [str(path) for path in entry_point_dir.rglob("*.java")],
+                output_dir,
+                classpath,
+            )
+
+        except ConfigurationError:
+            # The entry point's own errors are the relevant ones
+            raise error
+
+        print(
+            f'Compiled every Java file under "{entry_point_dir}", some classes are not in files named after them.'
+        )
+
+
+def compile_java_files(
+    java_files: list[str], output_dir: str, classpath: str | None = None
+) -> None:
+    """
+    Compiles the given Java source files into `output_dir`.
+
+    Raises:
+        ConfigurationError: If the compilation process fails.
+    """
+
+    cmd = ["javac", "-d", output_dir]
+    if classpath:
+        cmd.extend(["-cp", classpath])
+
+    cmd.extend(java_files)
+    run_javac(cmd, Path(output_dir))
+
+
+def run_javac(cmd: list[str], cwd: Path) -> None:
+    """
+    Runs a javac command.
+
+    Raises:
+        ConfigurationError: If javac is missing or the compilation fails,
+            with the corresponding error message from stderr.
+    """
 
     try:
-        result = run(cmd, capture_output=True, text=True, cwd=entry_point_dir)
+        result = run(cmd, capture_output=True, text=True, cwd=cwd)
 
         if result.returncode != 0:
             raise ConfigurationError(
@@ -0,0 +1,188 @@
+import sqlite3
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, TypeVar
+
+from .helpers import RESULTS_DIR, ConfigurationError, find_absolute_path
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+DIFF_CACHE_FILE_NAME = "diff_cache.sqlite"
+# Marks a diff function whose result only depends on the two outputs
+PURE_ATTRIBUTE = "autograder_pure"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diff_results (
+    test TEXT NOT NULL,
+    diff_function TEXT NOT NULL,
+    student_output TEXT NOT NULL,
+    reference_output TEXT NOT NULL,
+    score REAL NOT NULL,
+    feedback TEXT NOT NULL,
+    PRIMARY KEY (test, diff_function, student_output, reference_output)
+) WITHOUT ROWID;
+"""
+
+
+def pure(func: F) -> F:
+    """
+    Marks a diff function as pure, its result only depending on the student
+    and reference outputs, so its results can be reused.
+    """
+
+    setattr(func, PURE_ATTRIBUTE, True)
+    return func
+
+
+def is_pure(func: Callable[..., Any]) -> bool:
+    return getattr(func, PURE_ATTRIBUTE, False) is True
+
+
+def output_digest(output: str) -> str:
+    return sha256(output.encode("utf-8")).hexdigest()
+
+
+class DiffCache:
+    """
+    Results of pure diff functions by test, diff function, and outputs, the
+    `size` most recent ones kept in memory and, with `persist`, stored in the
+    results directory. Stored results are only reused for the same tests.py.
+    """
+
+    def __init__(self, size: int, persist: bool = False, tests_hash: str = ""):
+        self.size = size
+        self.persist = persist
+        self.tests_hash = tests_hash
+        self.hits = 0
+        self._results: OrderedDict[
+            tuple[str, str, str, str], tuple[float, str]
+        ] = OrderedDict()
+        self._lock = Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._pending: list[tuple[Any, ...]] = []
+        if persist:
+            try:
+                cache_path = (
+                    Path(find_absolute_path(RESULTS_DIR))
+                    / DIFF_CACHE_FILE_NAME
+                )
+                self._connection = sqlite3.connect(
+                    cache_path, timeout=1, check_same_thread=False
+                )
+                self._connection.execute("PRAGMA journal_mode = WAL")
+                self._connection.executescript(SCHEMA)
+
+            except (ConfigurationError, OSError, sqlite3.Error) as e:
+                self._disable_store(e)
+
+    def memoize(
+        self,
+        diff_func: Callable[[str, str], Any],
+        test: str,
+        identity: str,
+    ) -> Callable[[str, str], Any]:
+        """
+        Wraps a diff function, possibly isolated, of a test to reuse earlier
+        results for the same outputs.
+        """
+
+        def memoized(student_output: str, reference_output: str) -> Any:
+            # The tests.py hash covers code the fingerprint cannot see, like
+            # the modules it imports
+            key = (
+                test,
+                f"{self.tests_hash}:{identity}",
+                output_digest(student_output),
+                output_digest(reference_output),
+            )
+            result = self.get(key)
+            if result is not None:
+                return result
+
+            result = diff_func(student_output, reference_output)
+            if is_valid_result(result):
+                self.put(key, (result[0], result[1]))
+
+            return result
+
+        return memoized
+
+    def get(self, key: tuple[str, str, str, str]) -> tuple[float, str] | None:
+        with self._lock:
+            result = self._results.get(key, None)
+            if result is None and self._connection is not None:
+                try:
+                    row = self._connection.execute(
+                        "SELECT score, feedback FROM diff_results WHERE test = ? AND diff_function = ? AND student_output = ? AND reference_output = ?",
+                        key,
+                    ).fetchone()
+                    result = None if row is None else (row[0], row[1])
+
+                except sqlite3.Error as e:
+                    self._disable_store(e)
+
+            if result is None:
+                return None
+
+            self.hits += 1
+            self._remember(key, result)
+            return result
+
+    def put(
+        self, key: tuple[str, str, str, str], result: tuple[float, str]
+    ) -> None:
+        with self._lock:
+            self._remember(key, result)
+            if self._connection is not None:
+                self._pending.append((*key, *result))
+
+    def flush(self) -> None:
+        """
+        Writes the new results to the store in one short transaction, so
+        concurrent runs, like shards, only wait on each other briefly.
+        """
+
+        with self._lock:
+            if self._connection is not None and self._pending:
+                try:
+                    with self._connection:
+                        self._connection.executemany(
+                            "INSERT OR REPLACE INTO diff_results VALUES (?, ?, ?, ?, ?, ?)",
+                            self._pending,
+                        )
+
+                except sqlite3.Error as e:
+                    self._disable_store(e)
+
+            self._pending.clear()
+
+    def _remember(
+        self, key: tuple[str, str, str, str], result: tuple[float, str]
+    ) -> None:
+        self._results[key] = result
+        self._results.move_to_end(key)
+        if len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    def _disable_store(self, error: Exception) -> None:
+        print(f"Could not use the diff cache store: {error}")
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def is_valid_result(result: Any) -> bool:
+    """
+    Only well-formed results are cached, invalid ones are reported again on
+    every call.
+    """
+
+    return (
+        isinstance(result, (list, tuple))
+        and len(result) == 2
+        and isinstance(result[0], (int, float))
+        and 0 <= result[0] <= 1
+        and isinstance(result[1], str)
+    )
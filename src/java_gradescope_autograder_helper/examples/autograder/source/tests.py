@@ -40,11 +40,86 @@ def check_for_secret(
     return score_percentage, feedback
 
 
+# DIFF_FUNCTION_LIMITS is optional. Diff functions run in separate processes,
+# alongside the next tests, and each call is limited to "timeout" seconds and
+# "memory" additional megabytes. A diff function exceeding them, raising an
+# error, or crashing stops the autograder with an error naming the test.
+# Default:
+# DIFF_FUNCTION_LIMITS = {"timeout": 10, "memory": 1024}
+
+
+# PROFILE is optional. Once grading is done, student runs that timed out, or
+# took at least "slow" seconds if given, are run again with the Java Flight
+# Recorder. Recordings are saved in `results/profiles/` and the "top" methods
+# the program spent the most time in are added to the test's extra_data, and
+# shown to the student if "feedback" is True. Each recording reruns the
+# program, so only the "max_runs" slowest distinct runs are recorded, within
+# "budget" seconds in total.
+# Requires the JDK `jcmd` and `jfr` tools.
+# PROFILE = {
+#     "slow": None,
+#     "top": 5,
+#     "feedback": False,
+#     "max_runs": 5,
+#     "budget": 60,
+# }
+
+# TIMEOUT_POLICY is optional. Tests without their own "timeout" time out at
+# "factor" times the time the reference solution took on them, kept between
+# "floor" and "cap" seconds, so correct submissions do not time out on slow
+# machines and infinite loops are stopped early on fast ones. With a "source"
+# of "run", the reference time is measured while grading. With
+# "calibration", it is read from `source/calibration.json`, written by
+# running `autograder calibrate tests.py` on an otherwise idle machine, and
+# scaled by how fast the grading machine is. The timeout every test ran with
+# is saved in its extra_data.
+# TIMEOUT_POLICY = {"factor": 3, "floor": 0.5, "cap": 10, "source": "run"}
+
+# DIFF_CACHE is optional. Diff functions decorated with `pure`, whose result
+# only depends on the student and reference outputs, are not called again on
+# outputs they already scored for the same test:
+# from java_gradescope_autograder_helper.diff_cache import pure
+# The "size" most recent results are kept in memory. With "persist", results
+# are also stored in `results/diff_cache.sqlite`, so grading many
+# submissions or regrading reuses them across runs, until tests.py changes.
+# `autograder stats` shows how many distinct outputs each test saw.
+# DIFF_CACHE = {"size": 4096, "persist": False}
+
+# JVM_POOL is optional. TESTS run in JVMs started ahead of time, "size" of
+# them waiting per side, so each test's JVM starts while the previous test
+# runs. Every test still gets a JVM of its own, so static state and
+# `System.exit` behave as usual. Run times and time limits then exclude the
+# JVM startup. Tests with "env" or "output_files" start their own JVM. It is
+# not used on machines with a single core, where nothing can start ahead.
+# JVM_POOL = {"size": 1}
+
+# Large or generated TESTS can be planned with `autograder plan tests.py`,
+# which validates this file once and writes `source/tests.plan.json`, to be
+# zipped with it. `autograder run` then loads the planned tests instead of
+# generating and validating them again. The plan is only used while this
+# file and the reference sources are unchanged, otherwise this file is
+# validated as usual. Diff functions of planned tests must be defined at the
+# top level of a module, and changes to modules this file imports are not
+# noticed, so plan again after changing them. Loading the plan runs this file
+# without the top-level statements that use TESTS, so keep the generation of
+# the tests in them.
+
+
 CLASSPATH: str | None = None
 # ENTRY_POINT should not be a path, but just the name of the file containing
 # the main method.
 ENTRY_POINT: str = "Main.java"
 
+# COMPILE_ALL is optional. By default, only ENTRY_POINT and the classes it
+# uses (plus the classes METHOD_TESTS call) are compiled, found from the
+# directory of ENTRY_POINT, into a separate build directory. Unrelated files,
+# like old versions or test folders, are ignored. Classes are found by their
+# file name, so when a class is declared in a file named after another one,
+# like `class Circle` in `Shapes.java`, every Java file is compiled into the
+# build directory instead. Set it to True to compile every Java file next to
+# or under ENTRY_POINT in place instead.
+# COMPILE_ALL: bool = False
+
 # Comment this variable out if you do not want to use check style.
 # config_file: a relative path from the `/autograder` folder since that is
 # where Gradescope executes this file from.
@@ -77,12 +152,36 @@ CHECK_STYLE: dict[str, Any] = {
 # "visiblity".
 # Keep in mind that the scores must match whatever you set in Gradescope.
 # Additional package-only kwargs:
-# "timeout": int,  # Optional timeout in whole seconds for the test case.
+# "timeout": float,  # Optional timeout in seconds for the test case.
+# "stdin": str,  # Optional text written to the program's standard input.
+# "env": dict[str, str],  # Optional extra environment variables.
+# "output_files": list[str],  # Optional files, relative to the working
+# directory, the program writes. Each run then gets its own working directory
+# and every file is compared to the one the reference solution wrote. The
+# score is scaled by the fraction of matching files and the feedback shows
+# where the first mismatching line is.
+# Tests with the same command_line_args, stdin, env, and output_files only
+# run the reference and student programs once, so checking the same output
+# with different diff functions is free. The JVM launches a run took and
+# saved are in the "launches" of the results' extra_data.
 # Required:
 # max_score
 # Default:
 # visibility: "visible"
-# timeout: 1 # seconds
+# timeout: 1 # seconds, unless TIMEOUT_POLICY is set, None for no limit
+# TESTS can also be any iterable, like a generator, which is validated and
+# run lazily so even thousands of generated tests keep memory use flat. To
+# generate tests, use the helpers in `java_gradescope_autograder_helper`:
+# from java_gradescope_autograder_helper.test_sources import (
+#     parametrize,
+#     random_cases,
+# )
+# TESTS = parametrize(
+#     "add {} {}",
+#     random_cases(lambda rng: (rng.randint(0, 99), rng.randint(0, 99)), 1000),
+#     max_score=1,
+#     name="Evaluate {}+{}",
+# )
 TESTS: list[
     tuple[str, dict[str, Any]]
     | tuple[str, Callable[[str, str], tuple[float, str]], dict[str, Any]]
@@ -99,3 +198,54 @@ TESTS: list[
     ),
     ("add 5 6", {"max_score": 10, "name": "Evaluate 5+6"}),
 ]
+
+
+# METHOD_TESTS is optional. It tests individual methods instead of the main
+# method, running all method tests in a single JVM launch per solution. It is
+# a list of tuples with this structure:
+# (class_name, method_name, args, [optional]expected, gradescope_kwargs)
+# class_name: the class declaring the method, like "Main".
+# method_name: the name of the method. Static methods are called directly,
+# otherwise an instance is created with the no-argument constructor.
+# args: a list of JSON-like arguments (numbers, strings, booleans, None, and
+# lists for arrays or Lists), converted to the method's parameter types.
+# Integers too large for a long are passed as BigInteger.
+# expected: the expected return value, or a comparator function with the
+# same signature as a diff function that receives the student and reference
+# return values. If not provided, the return value is compared to the
+# reference solution's.
+# gradescope_kwargs: same as in TESTS, including "timeout".
+# Keep in mind static state is shared between method tests, until a test
+# times out or exits the JVM, after which both solutions start over.
+# METHOD_TESTS: list[tuple[Any, ...]] = [
+#     ("Main", "add", [1, 2], 3, {"max_score": 1}),
+#     ("Main", "greet", ["Bob"], {"max_score": 1, "name": "greet(Bob)"}),
+# ]
+
+
+# SAMPLE is optional. It runs a random subset of "size" tests out of all the
+# tests, keeping their order. The same "seed" always picks the same tests.
+# SAMPLE: dict[str, int] = {"size": 100, "seed": 0}
+# Large suites can also be split across machines or processes with
+# `autograder run --shard i/n tests.py` and `autograder merge`.
+
+
+# STAGES is optional. It adds custom checks to the grading pipeline, which
+# runs every stage as soon as the stages it depends on have finished. It is a
+# list of tuples with this structure:
+# (name, stage_function, dependencies)
+# name: a unique name for the stage.
+# stage_function: a function receiving a dictionary with the results of the
+# stages listed in dependencies. It returns None, a gradescope_kwargs-like
+# dictionary (with at least "max_score" and "score"), or a list of them,
+# which are added to the results after the tests and the style check.
+# dependencies: names of the stages that must finish first. Built-in stages:
+# "resolve": dictionary with "reference_entry_point_path",
+# "submission_entry_point_path", and "classpath".
+# "compile_reference", "compile_submission": None.
+# "run_tests", "run_method_tests": tuple of (execution_time, list of test
+# results).
+# "check_style": the style test result or None.
+# STAGES: list[tuple[str, Callable[[dict[str, Any]], Any], list[str]]] = [
+#     ("all_tests_ran", lambda results: None, ["run_tests"]),
+# ]
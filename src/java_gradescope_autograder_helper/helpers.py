@@ -1,9 +1,12 @@
+import inspect
 import os
-import signal
-from math import ceil
+import re
+from hashlib import sha256
 from pathlib import Path
+from subprocess import PIPE, CompletedProcess, Popen, TimeoutExpired, run
 from time import time
-from typing import Any, Callable
+from types import CodeType, ModuleType
+from typing import Any, Callable, cast
 
 # Gradescope autograder file structure: https://gradescope-autograders.readthedocs.io/en/latest/specs/#file-hierarchy
 SOURCE_DIR = "/autograder/source"
@@ -71,37 +74,175 @@ def timed_execution(
     return wrapper
 
 
-def time_limited_execution(seconds: int | None = None):
-    def handler(signum: int, frame: Any):
-        raise TimeoutError()
+def time_limited_run(
+    cmd: list[str],
+    seconds: float | None = None,
+    on_timeout: Callable[[int], Any] | None = None,
+    **kwargs: Any,
+) -> CompletedProcess[bytes] | TimeoutError:
+    """
+    Run a command, killing it once the time limit is exceeded.
+
+    Unlike an alarm signal, the limit also works outside the main thread and
+    does not leave the timed out process running. `on_timeout` is called with
+    the process id before the process is killed.
+    """
+
+    if seconds is None:
+        return run(cmd, **kwargs)
+
+    if on_timeout is None:
+        try:
+            return run(cmd, timeout=seconds, **kwargs)
+
+        except TimeoutExpired:
+            return TimeoutError(
+                f"Time limit of {seconds:g} second(s) exceeded."
+            )
+
+    input = kwargs.pop("input", None)
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = kwargs["stderr"] = PIPE
+
+    if input is not None:
+        kwargs["stdin"] = PIPE
+
+    with Popen(cmd, **kwargs) as process:
+        return communicate_within(process, input, seconds, on_timeout)
+
+
+def communicate_within(
+    process: Popen[bytes],
+    input: bytes | None,
+    seconds: float | None,
+    on_timeout: Callable[[int], Any] | None = None,
+) -> CompletedProcess[bytes] | TimeoutError:
+    """
+    Writes `input` to an already started process and waits for it to exit,
+    killing it once the time limit is exceeded.
+    """
+
+    try:
+        stdout, stderr = process.communicate(input, timeout=seconds)
+
+    except TimeoutExpired:
+        if on_timeout is not None:
+            on_timeout(process.pid)
+
+        process.kill()
+        process.communicate()
+        return TimeoutError(f"Time limit of {seconds:g} second(s) exceeded.")
+
+    return CompletedProcess(process.args, process.returncode, stdout, stderr)
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Hashes a test configuration, so equal configurations, including the code
+    of any functions in them and the values those functions use, get equal
+    fingerprints across runs.
+    """
+
+    def canonical(value: Any, seen: frozenset[int]) -> Any:
+        if isinstance(value, dict):
+            items = cast(dict[Any, Any], value).items()
+            return sorted((repr(k), canonical(v, seen)) for k, v in items)
 
-    def decorator(func: Callable[..., Any]):
-        def wrapper(
-            *args: Any, **kwargs: Any
-        ) -> tuple[Any, float] | TimeoutError:
-            if seconds is None:
-                return func(*args, **kwargs)
+        if isinstance(value, (list, tuple)):
+            return [canonical(item, seen) for item in cast(list[Any], value)]
 
-            int_seconds = ceil(seconds)
-            signal.signal(signal.SIGALRM, handler)
-            signal.alarm(int_seconds)
+        if callable(value):
+            qualname = getattr(value, "__qualname__", "")
+            if id(value) in seen:
+                # Recursive functions reference themselves
+                return ["callable", qualname]
 
             try:
-                result = func(*args, **kwargs)
+                code = inspect.getsource(value)
+            except (OSError, TypeError):
+                code = stable_repr(getattr(value, "__code__", value))
 
-            except TimeoutError:
-                return TimeoutError(
-                    f"Time limit of {int_seconds} second(s) exceeded."
-                )
+            return [
+                "callable",
+                qualname,
+                code,
+                canonical(function_dependencies(value), seen | {id(value)}),
+            ]
 
-            finally:
-                signal.alarm(0)
+        if isinstance(value, ModuleType):
+            # Their repr holds their path, which differs between machines
+            return ["module", value.__name__]
 
-            return result
+        return stable_repr(value)
+
+    return sha256(
+        repr(canonical(value, frozenset())).encode("utf-8")
+    ).hexdigest()
+
+
+def stable_repr(value: Any) -> str:
+    # Default reprs hold the object's address, which differs every run
+    return re.sub(r" at 0x[0-9a-fA-F]+", "", repr(value))
+
+
+def function_dependencies(func: Callable[..., Any]) -> list[tuple[str, Any]]:
+    """
+    Returns what a function's result depends on besides its code: default
+    arguments, captured variables, and the globals it references, like the
+    constants and helpers of a diff function in tests.py.
+    """
+
+    code = getattr(func, "__code__", None)
+    if not isinstance(code, CodeType):
+        return []
+
+    dependencies: list[tuple[str, Any]] = [
+        ("defaults", getattr(func, "__defaults__", None)),
+        ("kwdefaults", getattr(func, "__kwdefaults__", None)),
+    ]
+    for name, cell in zip(
+        code.co_freevars, getattr(func, "__closure__", None) or ()
+    ):
+        try:
+            dependencies.append((name, cell.cell_contents))
+        except ValueError:
+            # The captured variable is not assigned yet
+            continue
+
+    func_globals = getattr(func, "__globals__", {})
+    for name in sorted(global_names(code)):
+        if name in func_globals:
+            dependencies.append((name, func_globals[name]))
+
+    return dependencies
+
+
+def global_names(code: CodeType) -> set[str]:
+    """
+    Returns the names a code object, and the code nested in it, may look up
+    as globals. Attribute names are included too, only ones that are also
+    globals matter.
+    """
+
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= global_names(const)
+
+    return names
+
+
+def fingerprint_sources(directory: str) -> str:
+    """
+    Hashes the Java sources under a directory by relative path and content.
+    """
 
-        return wrapper
+    digest = sha256()
+    for path in sorted(Path(directory).rglob("*.java")):
+        digest.update(path.relative_to(directory).as_posix().encode("utf-8"))
+        digest.update(sha256(path.read_bytes()).digest())
 
-    return decorator
+    return digest.hexdigest()
 
 
 def load_env():
@@ -0,0 +1,318 @@
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+from math import ceil
+from pathlib import Path
+from statistics import median
+from typing import Any
+
+from .helpers import RESULTS_DIR, ConfigurationError, find_absolute_path
+
+HISTORY_FILE_NAME = "history.sqlite"
+# A test regressed when its latest time exceeds its median time in earlier
+# runs by this factor, and by at least the minimum seconds, which ignores
+# the noise of very short runs
+REGRESSION_FACTOR = 1.5
+REGRESSION_MIN_SECONDS = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    tests_file TEXT NOT NULL,
+    shard TEXT,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    test TEXT NOT NULL,
+    name TEXT NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL,
+    score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    stdout_size INTEGER NOT NULL,
+    stderr_size INTEGER NOT NULL,
+    output_hash TEXT
+);
+"""
+
+
+def record_run(
+    tests_file_name: str,
+    started_at: datetime,
+    duration: float,
+    status: str,
+    shard: tuple[int, int] | None,
+    stages: dict[str, tuple[float, str]],
+    tests: list[dict[str, Any]],
+) -> None:
+    """
+    Appends a run, with the time and status of its stages and tests, to the
+    history in the results directory.
+
+    Recording is best effort: errors are printed instead of raised, so the
+    history cannot fail a grading run.
+    """
+
+    try:
+        history_path = (
+            Path(find_absolute_path(RESULTS_DIR)) / HISTORY_FILE_NAME
+        )
+        connection = sqlite3.connect(history_path, timeout=1)
+        try:
+            # One short transaction per run, concurrent shards wait on it
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(SCHEMA)
+            migrate(connection)
+            with connection:
+                run_id = connection.execute(
+                    "INSERT INTO runs (started_at, tests_file, shard, status, duration) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        started_at.isoformat(timespec="seconds"),
+                        tests_file_name,
+                        None if shard is None else f"{shard[0]}/{shard[1]}",
+                        status,
+                        duration,
+                    ),
+                ).lastrowid
+                connection.executemany(
+                    "INSERT INTO stages VALUES (?, ?, ?, ?)",
+                    [(run_id, name, *stage) for name, stage in stages.items()],
+                )
+                connection.executemany(
+                    "INSERT INTO tests VALUES (:run_id, :test, :name, :duration, :status, :score, :max_score, :stdout_size, :stderr_size, :output_hash)",
+                    [{**test, "run_id": run_id} for test in tests],
+                )
+
+        finally:
+            connection.close()
+
+    except (ConfigurationError, OSError, sqlite3.Error) as e:
+        print(f"Could not record the run in the history: {e}")
+
+
+def migrate(connection: sqlite3.Connection) -> None:
+    """
+    Adds the columns introduced after a history was created.
+    """
+
+    columns = {
+        row[1] for row in connection.execute("PRAGMA table_info(tests)")
+    }
+    if "output_hash" not in columns:
+        connection.execute("ALTER TABLE tests ADD COLUMN output_hash TEXT")
+
+
+def print_stats(runs: int | None = None, limit: int = 10) -> None:
+    """
+    Prints the slowest and least stable tests, stage times, and regressions
+    of the last `runs` runs, showing `limit` tests in each list.
+
+    Raises:
+        ConfigurationError: If there is no history to report on.
+    """
+
+    history_path = Path(find_absolute_path(RESULTS_DIR)) / HISTORY_FILE_NAME
+    if not history_path.exists():
+        raise ConfigurationError(
+            f'No run history found at "{history_path}", run the autograder first.'
+        )
+
+    connection = sqlite3.connect(history_path)
+    try:
+        run_ids = [
+            row[0]
+            for row in connection.execute(
+                "SELECT id FROM runs ORDER BY id DESC LIMIT ?",
+                (-1 if runs is None else runs,),
+            )
+        ]
+        if not run_ids:
+            raise ConfigurationError("The run history is empty.")
+
+        first_run = min(run_ids)
+        test_rows = connection.execute(
+            "SELECT run_id, test, duration, status FROM tests WHERE run_id >= ? ORDER BY run_id",
+            (first_run,),
+        ).fetchall()
+        output_rows = connection.execute(
+            "SELECT test, output_hash, COUNT(*) FROM tests WHERE run_id >= ? AND output_hash IS NOT NULL GROUP BY test, output_hash",
+            (first_run,),
+        ).fetchall()
+        names = dict(
+            connection.execute(
+                "SELECT test, name FROM tests WHERE run_id >= ? ORDER BY run_id",
+                (first_run,),
+            )
+        )
+        stage_rows = connection.execute(
+            "SELECT name, duration FROM stages WHERE run_id >= ?",
+            (first_run,),
+        ).fetchall()
+        started, ended = connection.execute(
+            "SELECT MIN(started_at), MAX(started_at) FROM runs WHERE id >= ?",
+            (first_run,),
+        ).fetchone()
+
+    finally:
+        connection.close()
+
+    print(f"{len(run_ids)} run(s) from {started} to {ended}.")
+
+    durations: dict[str, list[float]] = defaultdict(list)
+    timeouts: dict[str, int] = defaultdict(int)
+    for _, test, duration, status in test_rows:
+        durations[test].append(duration)
+        timeouts[test] += status == "timeout"
+
+    slowest = sorted(
+        durations,
+        key=lambda test: percentile(durations[test], 90),
+        reverse=True,
+    )[:limit]
+    print_table(
+        "Slowest tests",
+        ["test", "runs", "p50", "p90", "p99", "max", "timeouts"],
+        [
+            [
+                names[test],
+                str(len(durations[test])),
+                *(
+                    f"{percentile(durations[test], p):.3f}s"
+                    for p in (50, 90, 99)
+                ),
+                f"{max(durations[test]):.3f}s",
+                f"{timeouts[test] / len(durations[test]):.0%}",
+            ]
+            for test in slowest
+        ],
+    )
+
+    stage_durations: dict[str, list[float]] = defaultdict(list)
+    for name, duration in stage_rows:
+        stage_durations[name].append(duration)
+
+    print_table(
+        "Stages",
+        ["stage", "runs", "p50", "p90", "max"],
+        [
+            [
+                name,
+                str(len(values)),
+                f"{percentile(values, 50):.3f}s",
+                f"{percentile(values, 90):.3f}s",
+                f"{max(values):.3f}s",
+            ]
+            for name, values in stage_durations.items()
+        ],
+    )
+
+    print_output_clusters(output_rows, names, limit)
+
+    regressions = find_regressions(test_rows, names, max(run_ids))
+    if regressions:
+        print_table(
+            "Regressions in the latest run", ["test", "change"], regressions
+        )
+
+    else:
+        print("\nNo regressions in the latest run.")
+
+
+def print_output_clusters(
+    output_rows: list[tuple[str, str, int]],
+    names: dict[str, str],
+    limit: int,
+) -> None:
+    """
+    Prints how many distinct outputs the tests with the most of them saw, and
+    how many runs produced the most common one. Diff functions marked as pure
+    only run once per distinct output.
+    """
+
+    clusters: dict[str, list[int]] = defaultdict(list)
+    for test, _, count in output_rows:
+        clusters[test].append(count)
+
+    most_distinct = sorted(
+        clusters, key=lambda test: len(clusters[test]), reverse=True
+    )[:limit]
+    print_table(
+        "Distinct outputs",
+        ["test", "runs", "distinct", "most common"],
+        [
+            [
+                names[test],
+                str(sum(clusters[test])),
+                str(len(clusters[test])),
+                f"{max(clusters[test]) / sum(clusters[test]):.0%} of runs",
+            ]
+            for test in most_distinct
+        ],
+    )
+
+
+def find_regressions(
+    test_rows: list[tuple[int, str, float, str]],
+    names: dict[str, str],
+    latest_run: int,
+) -> list[list[str]]:
+    """
+    Returns the tests of the latest run that got much slower than their
+    median in earlier runs, or that stopped passing.
+    """
+
+    earlier: dict[str, list[tuple[float, str]]] = defaultdict(list)
+    latest: dict[str, tuple[float, str]] = {}
+    for run_id, test, duration, status in test_rows:
+        if run_id == latest_run:
+            latest[test] = (duration, status)
+        else:
+            earlier[test].append((duration, status))
+
+    regressions: list[list[str]] = []
+    for test, (duration, status) in latest.items():
+        if not earlier[test]:
+            continue
+
+        usual = median(d for d, _ in earlier[test])
+        if (
+            duration > usual * REGRESSION_FACTOR
+            and duration - usual >= REGRESSION_MIN_SECONDS
+        ):
+            regressions.append(
+                [names[test], f"took {duration:.3f}s, usually {usual:.3f}s"]
+            )
+
+        last_status = earlier[test][-1][1]
+        if last_status == "passed" and status != "passed":
+            regressions.append([names[test], f"{last_status} -> {status}"])
+
+    return regressions
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Nearest-rank percentile, which is always one of the values.
+    """
+
+    ordered = sorted(values)
+    return ordered[max(ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def print_table(title: str, header: list[str], rows: list[list[str]]) -> None:
+    widths = [
+        max(len(row[i]) for row in [header, *rows]) for i in range(len(header))
+    ]
+    print(f"\n{title}:\n")
+    for row in [header, *rows]:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
@@ -0,0 +1,235 @@
+import multiprocessing
+import pickle
+import resource
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from multiprocessing.connection import Connection
+from threading import Thread
+from traceback import format_exc
+from typing import Any, Callable, TypeVar
+
+from .helpers import ConfigurationError
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class IsolationPool:
+    """
+    Worker processes forked before grading starts any thread, which fork the
+    child of each isolated call. It has to be created after the tests module
+    is loaded, since functions are sent to it by reference.
+    """
+
+    def __init__(self, size: int):
+        self._executor: ProcessPoolExecutor | None = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            self._executor = ProcessPoolExecutor(
+                size, mp_context=multiprocessing.get_context("fork")
+            )
+            # With fork, every worker is started by the first submission
+            self._executor.submit(int).result()
+
+    def can_run(self, func: Callable[..., Any]) -> bool:
+        if self._executor is None:
+            return False
+
+        try:
+            pickle.dumps(func)
+
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+
+        return True
+
+    def call(
+        self,
+        func: Callable[..., Any],
+        args: tuple[Any, ...],
+        description: str,
+        timeout: float | None,
+        memory_limit: int | None,
+    ) -> Any:
+        assert self._executor is not None
+        return self._executor.submit(
+            call_in_child_process,
+            func,
+            args,
+            description,
+            timeout,
+            memory_limit,
+        ).result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+
+def isolate_function(
+    func: F,
+    description: str,
+    timeout: float | None,
+    memory_limit: int | None,
+    pool: IsolationPool | None = None,
+) -> F:
+    """
+    Wraps a user-provided function so every call runs in a child process
+    forked by `pool`, limited to `timeout` seconds and `memory_limit`
+    megabytes, or in a thread limited to `timeout` when it cannot be forked.
+    Failures raise a ConfigurationError starting with `description`.
+    """
+
+    if pool is not None and pool.can_run(func):
+
+        @wraps(func)
+        def pooled(*args: Any) -> Any:
+            assert pool is not None
+            return pool.call(func, args, description, timeout, memory_limit)
+
+        return pooled  # type: ignore
+
+    @wraps(func)
+    def wrapper(*args: Any) -> Any:
+        return call_in_thread(func, args, description, timeout)
+
+    return wrapper  # type: ignore
+
+
+def call_in_thread(
+    func: Callable[..., Any],
+    args: tuple[Any, ...],
+    description: str,
+    timeout: float | None,
+) -> Any:
+    """
+    Raises:
+        ConfigurationError: If the call does not return a result in time,
+            leaving it running in a daemon thread.
+    """
+
+    outcome: list[tuple[str, Any]] = []
+
+    def target() -> None:
+        try:
+            outcome.append(("ok", func(*args)))
+
+        except MemoryError:
+            outcome.append(("memory", None))
+
+        except BaseException:
+            outcome.append(("error", format_exc()))
+
+    thread = Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if not outcome:
+        raise ConfigurationError(
+            f"{description} exceeded the time limit of {timeout} second(s)."
+        )
+
+    status, payload = outcome[0]
+    if status == "memory":
+        raise ConfigurationError(f"{description} ran out of memory.")
+
+    if status == "error":
+        raise ConfigurationError(
+            f"{description} raised an error:\n\n{payload}"
+        )
+
+    return payload
+
+
+def call_in_child_process(
+    func: Callable[..., Any],
+    args: tuple[Any, ...],
+    description: str,
+    timeout: float | None,
+    memory_limit: int | None,
+) -> Any:
+    """
+    Raises:
+        ConfigurationError: If the call does not return a result in time.
+    """
+
+    # Called from the single threaded pool workers, forking (instead of
+    # spawning) lets the child call the function without pickling it again.
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=child_main,
+        args=(sender, func, args, memory_limit),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise ConfigurationError(
+                f"{description} exceeded the time limit of {timeout} second(s)."
+            )
+
+        status, payload = receiver.recv()
+
+    except EOFError:
+        process.join()
+        raise ConfigurationError(
+            f"{description} crashed with exit code {process.exitcode}."
+        )
+
+    finally:
+        if process.is_alive():
+            process.kill()
+
+        process.join()
+        receiver.close()
+
+    if status == "memory":
+        raise ConfigurationError(
+            f"{description} exceeded the memory limit of {memory_limit} MB."
+        )
+
+    if status == "error":
+        raise ConfigurationError(
+            f"{description} raised an error:\n\n{payload}"
+        )
+
+    return payload
+
+
+def child_main(
+    sender: Connection,
+    func: Callable[..., Any],
+    args: tuple[Any, ...],
+    memory_limit: int | None,
+) -> None:
+    if memory_limit is not None:
+        limit_memory(memory_limit)
+
+    try:
+        sender.send(("ok", func(*args)))
+
+    except MemoryError:
+        sender.send(("memory", None))
+
+    except BaseException:
+        sender.send(("error", format_exc()))
+
+
+def limit_memory(megabytes: int) -> None:
+    """
+    Caps the address space of the current process to what it already uses
+    plus `megabytes`, since a forked child inherits the parent's memory.
+    """
+
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            used = int(statm.read().split()[0]) * resource.getpagesize()
+
+    except OSError:
+        used = 0
+
+    limit = used + megabytes * 1024 * 1024
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+    if hard_limit != resource.RLIM_INFINITY:
+        limit = min(limit, hard_limit)
+
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
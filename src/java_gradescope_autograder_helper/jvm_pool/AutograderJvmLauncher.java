@@ -0,0 +1,122 @@
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.util.Base64;
+
+/*
+ * Parks a JVM of java_gradescope_autograder_helper until a test needs it.
+ *
+ * Usage: java AutograderJvmLauncher <entry class>
+ *
+ * Commonly used core classes are loaded, and so is the entry class, without
+ * initializing it. Then a single READY byte is written to the standard output
+ * and the JVM waits for the first line of its standard input: the class to
+ * run and the program arguments, each base64 encoded and separated by
+ * spaces. Its main method runs as if the JVM had been launched for it, with
+ * the rest of the standard input as its own. Each JVM only runs one program,
+ * so no static state is shared between tests.
+ */
+public class AutograderJvmLauncher {
+    private static final int READY = 6;
+    private static final String[] CORE_CLASSES = {
+        "java.io.BufferedReader",
+        "java.io.InputStreamReader",
+        "java.lang.invoke.StringConcatFactory",
+        "java.util.ArrayList",
+        "java.util.Arrays",
+        "java.util.Collections",
+        "java.util.Formatter",
+        "java.util.HashMap",
+        "java.util.HashSet",
+        "java.util.LinkedList",
+        "java.util.Random",
+        "java.util.Scanner",
+        "java.util.TreeMap",
+        "java.util.regex.Pattern",
+        "java.util.stream.Collectors",
+    };
+
+    public static void main(String[] args) throws Throwable {
+        ClassLoader loader = ClassLoader.getSystemClassLoader();
+        for (String name : CORE_CLASSES) {
+            try {
+                Class.forName(name, true, loader);
+            } catch (ClassNotFoundException e) {
+                // Only a head start, the class loads later if it is used
+            }
+        }
+
+        if (args.length > 0) {
+            try {
+                Class.forName(args[0], false, loader);
+            } catch (ClassNotFoundException e) {
+                // Reported when the program is run
+            } catch (LinkageError e) {
+                // Reported when the program is run
+            }
+        }
+
+        System.out.write(READY);
+        System.out.flush();
+        String header = readLine(System.in);
+        if (header == null) {
+            // The pool closed without using this JVM
+            return;
+        }
+
+        Base64.Decoder decoder = Base64.getDecoder();
+        String[] fields = header.split(" ", -1);
+        String className = new String(decoder.decode(fields[0]), "UTF-8");
+        String[] programArgs = new String[fields.length - 1];
+        for (int i = 1; i < fields.length; i++) {
+            programArgs[i - 1] = new String(decoder.decode(fields[i]), "UTF-8");
+        }
+
+        Class<?> entry = Class.forName(className, true, loader);
+        Method main = entry.getMethod("main", String[].class);
+        try {
+            main.invoke(null, (Object) programArgs);
+        } catch (InvocationTargetException e) {
+            // Thrown from this main method, the JVM reports it exactly like
+            // an exception thrown from the program's main method
+            throw withoutLauncherFrames(e.getCause(), className);
+        }
+    }
+
+    /*
+     * Reads one line byte by byte, so the buffered standard input keeps every
+     * byte after it for the program.
+     */
+    static String readLine(InputStream in) throws IOException {
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        int b;
+        while ((b = in.read()) != -1 && b != '\n') {
+            line.write(b);
+        }
+
+        if (b == -1 && line.size() == 0) {
+            return null;
+        }
+
+        return line.toString("UTF-8");
+    }
+
+    static Throwable withoutLauncherFrames(Throwable error, String className) {
+        StackTraceElement[] frames = error.getStackTrace();
+        int end = frames.length;
+        while (end > 0 && !(frames[end - 1].getClassName().equals(className)
+                && frames[end - 1].getMethodName().equals("main"))) {
+            end--;
+        }
+
+        if (end > 0) {
+            StackTraceElement[] programFrames = new StackTraceElement[end];
+            System.arraycopy(frames, 0, programFrames, 0, end);
+            error.setStackTrace(programFrames);
+        }
+
+        return error;
+    }
+}
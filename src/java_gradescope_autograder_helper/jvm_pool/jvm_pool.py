@@ -0,0 +1,144 @@
+import importlib.resources
+import os
+from base64 import b64encode
+from collections import defaultdict, deque
+from select import select
+from subprocess import PIPE, CompletedProcess, Popen
+from threading import Lock
+from time import time
+
+from ..compiler import compile_java_files
+from ..helpers import communicate_within
+
+LAUNCHER_CLASS = "AutograderJvmLauncher"
+# Written by the launcher once it is ready to run a program
+READY = b"\x06"
+# Seconds to wait for a JVM to be ready before starting the time limit anyway
+STARTUP_TIMEOUT = 30
+
+
+def available_cores() -> int:
+    """
+    Returns the number of cores this process can run on.
+    """
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def compile_launcher(build_dir: str) -> None:
+    """
+    Compiles the launcher parked JVMs wait in into `build_dir`.
+
+    Raises:
+        ConfigurationError: If the launcher does not compile.
+    """
+
+    with importlib.resources.path(
+        "java_gradescope_autograder_helper.jvm_pool",
+        f"{LAUNCHER_CLASS}.java",
+    ) as launcher_path:
+        compile_java_files([str(launcher_path)], build_dir)
+
+
+class JvmPool:
+    """
+    Keeps `size` JVMs started ahead of time for every (classpath, working
+    directory, entry class), each running a single program, so run times and
+    time limits exclude the JVM startup.
+    """
+
+    def __init__(self, launcher_dir: str, size: int):
+        self.launcher_dir = launcher_dir
+        self.size = size
+        self._parked: defaultdict[
+            tuple[str, str, str], deque[Popen[bytes]]
+        ] = defaultdict(deque)
+        self._lock = Lock()
+
+    def warm(self, classpath: str, cwd: str, class_name: str) -> None:
+        """
+        Starts the JVMs for a program before its first run.
+        """
+
+        with self._lock:
+            self._refill((classpath, cwd, class_name))
+
+    def run(
+        self,
+        classpath: str,
+        cwd: str,
+        class_name: str,
+        args: list[str],
+        input: bytes | None = None,
+        timeout: float | None = None,
+    ) -> tuple[CompletedProcess[bytes] | TimeoutError, float]:
+        """
+        Runs a program in a parked JVM, returning the completed process, or
+        the error if it timed out, and the time from handing the program to
+        the JVM until it exited.
+        """
+
+        key = (classpath, cwd, class_name)
+        with self._lock:
+            parked = self._parked[key]
+            process = parked.popleft() if parked else self._start(key)
+            self._refill(key)
+
+        # The time limit starts once the JVM is ready, so a JVM that did not
+        # finish starting, like on a busy machine, does not count against it.
+        # A JVM that failed to start reports why as the program's error.
+        assert process.stdout is not None
+        stdout_fd = process.stdout.fileno()
+        if select([stdout_fd], [], [], STARTUP_TIMEOUT)[0]:
+            os.read(stdout_fd, len(READY))
+
+        fields = [class_name, *args]
+        header = " ".join(
+            b64encode(field.encode("utf-8")).decode("ascii")
+            for field in fields
+        )
+        start = time()
+        with process:
+            result = communicate_within(
+                process,
+                f"{header}\n".encode() + (input or b""),
+                timeout,
+            )
+
+        return result, time() - start
+
+    def close(self) -> None:
+        """
+        Stops every parked JVM.
+        """
+
+        with self._lock:
+            for parked in self._parked.values():
+                while parked:
+                    process = parked.popleft()
+                    process.kill()
+                    process.communicate()
+
+    def _refill(self, key: tuple[str, str, str]) -> None:
+        parked = self._parked[key]
+        while len(parked) < self.size:
+            parked.append(self._start(key))
+
+    def _start(self, key: tuple[str, str, str]) -> Popen[bytes]:
+        classpath, cwd, class_name = key
+        return Popen(
+            [
+                "java",
+                "-cp",
+                os.pathsep.join([self.launcher_dir, classpath]),
+                LAUNCHER_CLASS,
+                class_name,
+            ],
+            stdin=PIPE,
+            stdout=PIPE,
+            stderr=PIPE,
+            cwd=cwd,
+        )
@@ -1,15 +1,30 @@
+import ast
 import importlib.util
+import sys
+from importlib.machinery import SourceFileLoader
+from typing import Any
 
-def load_module(module_path: str, module_name: str = "tests") -> object:
+
+def load_module(
+    module_path: str, module_name: str = "tests", skipped: str | None = None
+) -> object:
     """
-    Load a module from the specified file path.
+    Load a module from the specified file path and register it under its
+    name. With `skipped`, top-level statements using that name are not run.
 
     Raises:
         ConfigurationError: If the module cannot be loaded from the given
             path.
     """
 
-    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    loader = (
+        None
+        if skipped is None
+        else SkippingLoader(module_name, module_path, skipped)
+    )
+    spec = importlib.util.spec_from_file_location(
+        module_name, module_path, loader=loader
+    )
     if spec is None:
         # If this occurs, the program cannot proceed at all.
         raise Exception(
@@ -23,4 +38,50 @@ def load_module(module_path: str, module_name: str = "tests") -> object:
         )
 
     spec.loader.exec_module(module)
+    sys.modules[module_name] = module
     return module
+
+
+class SkippingLoader(SourceFileLoader):
+    """
+    Loads a module without the top-level statements that use a name.
+    """
+
+    def __init__(self, fullname: str, path: str, skipped: str) -> None:
+        super().__init__(fullname, path)
+        self.skipped = skipped
+
+    def source_to_code(
+        self, data: Any, path: Any, *, _optimize: int = -1
+    ) -> Any:
+        tree = ast.parse(data, path)
+        tree.body = [
+            statement
+            for statement in tree.body
+            if not uses_name(statement, self.skipped)
+        ]
+        return compile(
+            tree, path, "exec", dont_inherit=True, optimize=_optimize
+        )
+
+    def get_code(self, fullname: str) -> Any:
+        # The bytecode cache holds the whole module, so it is not used
+        path = self.get_filename(fullname)
+        return self.source_to_code(self.get_data(path), path)
+
+
+def uses_name(statement: ast.stmt, name: str) -> bool:
+    """
+    Returns whether a statement uses a name outside of the bodies of the
+    functions and classes it defines.
+    """
+
+    if isinstance(
+        statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    ):
+        return False
+
+    return any(
+        isinstance(node, ast.Name) and node.id == name
+        for node in ast.walk(statement)
+    )
@@ -0,0 +1,488 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.Array;
+import java.lang.reflect.Constructor;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.math.BigDecimal;
+import java.math.BigInteger;
+import java.util.ArrayList;
+import java.util.Collection;
+import java.util.Iterator;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.Callable;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.FutureTask;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.TimeoutException;
+
+/*
+ * Runs the METHOD_TESTS of java_gradescope_autograder_helper in one JVM.
+ *
+ * Usage: java MethodTestDriver <cases.jsonl> <results.jsonl>
+ *
+ * Every line of the cases file is a JSON object with "case", "class",
+ * "method", "args", and "timeout" (in milliseconds). For every finished case,
+ * a JSON line with "case", "status" ("ok", "error", or "timeout"), "value",
+ * "output" (what the method printed), and "error" is appended to the results
+ * file, so the cases finished before a System.exit call are kept.
+ *
+ * A timed out case's thread cannot be stopped safely, and left running it
+ * would use the CPU, change static state, and print into the next cases'
+ * output. So the driver exits after a timeout, and the autograder relaunches
+ * it for the remaining cases.
+ */
+public class MethodTestDriver {
+    public static void main(String[] args) throws Exception {
+        BufferedReader cases = new BufferedReader(
+            new InputStreamReader(new FileInputStream(args[0]), "UTF-8")
+        );
+        PrintStream results = new PrintStream(
+            new FileOutputStream(args[1], true), true, "UTF-8"
+        );
+
+        String line;
+        while ((line = cases.readLine()) != null) {
+            if (line.trim().isEmpty()) {
+                continue;
+            }
+
+            Map<String, Object> testCase = (Map<String, Object>) new JsonParser(line).parse();
+            if (!runCase(testCase, results)) {
+                break;
+            }
+        }
+
+        cases.close();
+        results.close();
+        // Stops the thread of a timed out case
+        System.exit(0);
+    }
+
+    /*
+     * Runs a case and appends its result, returning false if it timed out.
+     */
+    static boolean runCase(Map<String, Object> testCase, PrintStream results) {
+        final String className = (String) testCase.get("class");
+        final String methodName = (String) testCase.get("method");
+        final List<Object> arguments = (List<Object>) testCase.get("args");
+        long timeout = ((Number) testCase.get("timeout")).longValue();
+
+        PrintStream originalOut = System.out;
+        ByteArrayOutputStream output = new ByteArrayOutputStream();
+        FutureTask<Object> task = new FutureTask<Object>(new Callable<Object>() {
+            public Object call() throws Exception {
+                return invoke(className, methodName, arguments);
+            }
+        });
+        Thread thread = new Thread(task);
+        thread.setDaemon(true);
+
+        String status = "ok";
+        Object value = null;
+        String error = null;
+        try {
+            System.setOut(new PrintStream(output, true, "UTF-8"));
+            thread.start();
+            value = task.get(timeout, TimeUnit.MILLISECONDS);
+        } catch (TimeoutException e) {
+            status = "timeout";
+        } catch (ExecutionException e) {
+            Throwable cause = e.getCause();
+            if (cause instanceof InvocationTargetException && cause.getCause() != null) {
+                cause = cause.getCause();
+            }
+
+            status = "error";
+            error = cause.toString();
+        } catch (Exception e) {
+            status = "error";
+            error = e.toString();
+        } finally {
+            System.setOut(originalOut);
+        }
+
+        StringBuilder json = new StringBuilder();
+        json.append("{\"case\": ");
+        toJson(testCase.get("case"), json);
+        json.append(", \"status\": ");
+        toJson(status, json);
+        json.append(", \"value\": ");
+        toJson(value, json);
+        json.append(", \"output\": ");
+        toJson(new String(output.toByteArray(), java.nio.charset.StandardCharsets.UTF_8), json);
+        json.append(", \"error\": ");
+        toJson(error, json);
+        json.append("}");
+        results.println(json.toString());
+        return !status.equals("timeout");
+    }
+
+    static Object invoke(String className, String methodName, List<Object> arguments)
+            throws Exception {
+        Class<?> cls = Class.forName(className);
+        Method[] methods = cls.getDeclaredMethods();
+        for (int m = 0; m < methods.length; m++) {
+            Method method = methods[m];
+            Class<?>[] types = method.getParameterTypes();
+            if (!method.getName().equals(methodName) || types.length != arguments.size()) {
+                continue;
+            }
+
+            Object[] converted = new Object[types.length];
+            boolean matches = true;
+            for (int i = 0; i < types.length && matches; i++) {
+                try {
+                    converted[i] = convert(arguments.get(i), types[i]);
+                } catch (IllegalArgumentException e) {
+                    matches = false;
+                }
+            }
+
+            if (!matches) {
+                continue;
+            }
+
+            method.setAccessible(true);
+            Object target = null;
+            if (!Modifier.isStatic(method.getModifiers())) {
+                Constructor<?> constructor = cls.getDeclaredConstructor();
+                constructor.setAccessible(true);
+                target = constructor.newInstance();
+            }
+
+            return method.invoke(target, converted);
+        }
+
+        throw new NoSuchMethodException(
+            className + "." + methodName + " taking " + arguments.size()
+                + " argument(s) of compatible types"
+        );
+    }
+
+    static Object convert(Object value, Class<?> type) {
+        if (value == null) {
+            if (type.isPrimitive()) {
+                throw new IllegalArgumentException();
+            }
+
+            return null;
+        }
+
+        if (value instanceof Long) {
+            long number = ((Long) value).longValue();
+            if ((type == int.class || type == Integer.class) && number == (int) number) {
+                return Integer.valueOf((int) number);
+            }
+
+            if (type == long.class || type == Long.class) {
+                return Long.valueOf(number);
+            }
+
+            if ((type == short.class || type == Short.class) && number == (short) number) {
+                return Short.valueOf((short) number);
+            }
+
+            if ((type == byte.class || type == Byte.class) && number == (byte) number) {
+                return Byte.valueOf((byte) number);
+            }
+        }
+
+        if (value instanceof Long && type == BigInteger.class) {
+            return BigInteger.valueOf(((Long) value).longValue());
+        }
+
+        if (value instanceof Number && type == BigDecimal.class) {
+            return new BigDecimal(value.toString());
+        }
+
+        if (value instanceof Number) {
+            double number = ((Number) value).doubleValue();
+            if (type == double.class || type == Double.class) {
+                return Double.valueOf(number);
+            }
+
+            if (type == float.class || type == Float.class) {
+                return Float.valueOf((float) number);
+            }
+        }
+
+        if (value instanceof String) {
+            String string = (String) value;
+            if ((type == char.class || type == Character.class) && string.length() == 1) {
+                return Character.valueOf(string.charAt(0));
+            }
+        }
+
+        if (value instanceof List) {
+            List<Object> list = (List<Object>) value;
+            if (type.isArray()) {
+                Object array = Array.newInstance(type.getComponentType(), list.size());
+                for (int i = 0; i < list.size(); i++) {
+                    Array.set(array, i, convert(list.get(i), type.getComponentType()));
+                }
+
+                return array;
+            }
+
+            if (type.isAssignableFrom(ArrayList.class)) {
+                return new ArrayList<Object>(list);
+            }
+        }
+
+        if (value instanceof Map && type.isAssignableFrom(LinkedHashMap.class)) {
+            return value;
+        }
+
+        if (!type.isPrimitive() && type.isInstance(value)) {
+            return value;
+        }
+
+        if (type == boolean.class && value instanceof Boolean) {
+            return value;
+        }
+
+        throw new IllegalArgumentException();
+    }
+
+    static void toJson(Object value, StringBuilder json) {
+        if (value == null) {
+            json.append("null");
+        } else if (value instanceof Boolean) {
+            json.append(value.toString());
+        } else if (value instanceof Double || value instanceof Float) {
+            double number = ((Number) value).doubleValue();
+            if (Double.isNaN(number) || Double.isInfinite(number)) {
+                toJson(String.valueOf(number), json);
+            } else {
+                json.append(String.valueOf(number));
+            }
+        } else if (value instanceof Number) {
+            json.append(value.toString());
+        } else if (value instanceof CharSequence || value instanceof Character) {
+            String string = value.toString();
+            json.append('"');
+            for (int i = 0; i < string.length(); i++) {
+                char c = string.charAt(i);
+                if (c == '"' || c == '\\') {
+                    json.append('\\').append(c);
+                } else if (c < 0x20 || c > 0x7e) {
+                    json.append(String.format("\\u%04x", Integer.valueOf(c)));
+                } else {
+                    json.append(c);
+                }
+            }
+            json.append('"');
+        } else if (value.getClass().isArray()) {
+            json.append('[');
+            for (int i = 0; i < Array.getLength(value); i++) {
+                if (i > 0) {
+                    json.append(", ");
+                }
+
+                toJson(Array.get(value, i), json);
+            }
+            json.append(']');
+        } else if (value instanceof Collection) {
+            json.append('[');
+            Iterator<?> items = ((Collection<?>) value).iterator();
+            for (int i = 0; items.hasNext(); i++) {
+                if (i > 0) {
+                    json.append(", ");
+                }
+
+                toJson(items.next(), json);
+            }
+            json.append(']');
+        } else if (value instanceof Map) {
+            json.append('{');
+            Iterator<?> entries = ((Map<?, ?>) value).entrySet().iterator();
+            for (int i = 0; entries.hasNext(); i++) {
+                Map.Entry<?, ?> entry = (Map.Entry<?, ?>) entries.next();
+                if (i > 0) {
+                    json.append(", ");
+                }
+
+                toJson(String.valueOf(entry.getKey()), json);
+                json.append(": ");
+                toJson(entry.getValue(), json);
+            }
+            json.append('}');
+        } else {
+            toJson(String.valueOf(value), json);
+        }
+    }
+
+    /*
+     * Minimal parser for the JSON written by the autograder: objects become
+     * LinkedHashMaps, arrays ArrayLists, integers Longs, and other numbers
+     * Doubles.
+     */
+    static class JsonParser {
+        private final String text;
+        private int position = 0;
+
+        JsonParser(String text) {
+            this.text = text;
+        }
+
+        Object parse() {
+            skipWhitespace();
+            char c = text.charAt(position);
+            if (c == '{') {
+                return parseObject();
+            }
+
+            if (c == '[') {
+                return parseArray();
+            }
+
+            if (c == '"') {
+                return parseString();
+            }
+
+            if (text.startsWith("true", position)) {
+                position += 4;
+                return Boolean.TRUE;
+            }
+
+            if (text.startsWith("false", position)) {
+                position += 5;
+                return Boolean.FALSE;
+            }
+
+            if (text.startsWith("null", position)) {
+                position += 4;
+                return null;
+            }
+
+            return parseNumber();
+        }
+
+        private Map<String, Object> parseObject() {
+            Map<String, Object> object = new LinkedHashMap<String, Object>();
+            position++;
+            skipWhitespace();
+            if (text.charAt(position) == '}') {
+                position++;
+                return object;
+            }
+
+            while (true) {
+                skipWhitespace();
+                String key = parseString();
+                skipWhitespace();
+                expect(':');
+                object.put(key, parse());
+                skipWhitespace();
+                if (text.charAt(position) == '}') {
+                    position++;
+                    return object;
+                }
+
+                expect(',');
+            }
+        }
+
+        private List<Object> parseArray() {
+            List<Object> array = new ArrayList<Object>();
+            position++;
+            skipWhitespace();
+            if (text.charAt(position) == ']') {
+                position++;
+                return array;
+            }
+
+            while (true) {
+                array.add(parse());
+                skipWhitespace();
+                if (text.charAt(position) == ']') {
+                    position++;
+                    return array;
+                }
+
+                expect(',');
+            }
+        }
+
+        private String parseString() {
+            expect('"');
+            StringBuilder string = new StringBuilder();
+            while (true) {
+                char c = text.charAt(position++);
+                if (c == '"') {
+                    return string.toString();
+                }
+
+                if (c != '\\') {
+                    string.append(c);
+                    continue;
+                }
+
+                char escaped = text.charAt(position++);
+                if (escaped == 'u') {
+                    string.append((char) Integer.parseInt(text.substring(position, position + 4), 16));
+                    position += 4;
+                } else if (escaped == 'n') {
+                    string.append('\n');
+                } else if (escaped == 't') {
+                    string.append('\t');
+                } else if (escaped == 'r') {
+                    string.append('\r');
+                } else if (escaped == 'b') {
+                    string.append('\b');
+                } else if (escaped == 'f') {
+                    string.append('\f');
+                } else {
+                    string.append(escaped);
+                }
+            }
+        }
+
+        private Object parseNumber() {
+            int start = position;
+            boolean integral = true;
+            while (position < text.length() && "+-0123456789.eE".indexOf(text.charAt(position)) >= 0) {
+                char c = text.charAt(position++);
+                if (c == '.' || c == 'e' || c == 'E') {
+                    integral = false;
+                }
+            }
+
+            String number = text.substring(start, position);
+            if (integral) {
+                try {
+                    return Long.valueOf(Long.parseLong(number));
+                } catch (NumberFormatException e) {
+                    // Outside the range of long
+                    return new BigInteger(number);
+                }
+            }
+
+            return Double.valueOf(Double.parseDouble(number));
+        }
+
+        private void skipWhitespace() {
+            while (position < text.length() && Character.isWhitespace(text.charAt(position))) {
+                position++;
+            }
+        }
+
+        private void expect(char c) {
+            if (text.charAt(position) != c) {
+                throw new IllegalArgumentException(
+                    "Expected '" + c + "' at position " + position + " of " + text
+                );
+            }
+
+            position++;
+        }
+    }
+}
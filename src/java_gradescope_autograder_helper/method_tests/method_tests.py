@@ -0,0 +1,354 @@
+import importlib.resources
+import json
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, cast
+
+from ..compiler import compile_java_files
+from ..helpers import ConfigurationError, time_limited_run, timed_execution
+from ..isolation import IsolationPool, isolate_function
+from ..test_runner import validate_custom_diff_func_output
+
+DRIVER_CLASS = "MethodTestDriver"
+# Seconds the driver JVM gets on top of the sum of its cases' timeouts
+DRIVER_GRACE_PERIOD = 10
+
+
+# Expected value of method tests that compare the student's return value to
+# the reference solution's
+FROM_REFERENCE = object()
+
+
+def run_method_tests(
+    tests: list[tuple[str, str, list[Any], Any, dict[str, Any]]],
+    reference_dir: str,
+    submission_dir: str,
+    reference_classpath: str,
+    submission_classpath: str,
+    diff_limits: dict[str, int] | None = None,
+    isolation_pool: IsolationPool | None = None,
+) -> tuple[float, list[dict[str, Any]]]:
+    """
+    Runs every method test of each side in a single JVM launch using the
+    generic MethodTestDriver, from the side's directory and with its
+    classpath. Comparators are isolated like diff functions.
+
+    Raises:
+        ConfigurationError: If the driver does not compile or the reference
+            solution fails any method test it is needed for.
+    """
+
+    if not tests:
+        return 0, []
+
+    with TemporaryDirectory() as build_dir:
+        with importlib.resources.path(
+            "java_gradescope_autograder_helper.method_tests",
+            f"{DRIVER_CLASS}.java",
+        ) as driver_path:
+            compile_java_files([str(driver_path)], build_dir)
+
+        student_records, execution_time, relaunches = run_driver(
+            tests,
+            range(len(tests)),
+            build_dir,
+            submission_dir,
+            submission_classpath,
+        )
+        # The reference is relaunched before the same cases, so stateful
+        # cases see the same static state on both sides
+        reference_cases = [
+            i
+            for i, (_, _, _, expected, _) in enumerate(tests)
+            if expected is FROM_REFERENCE or callable(expected)
+        ]
+        reference_records, _, _ = run_driver(
+            tests,
+            reference_cases,
+            build_dir,
+            reference_dir,
+            reference_classpath,
+            relaunches,
+        )
+
+    results: list[dict[str, Any]] = []
+    for i, test in enumerate(tests):
+        reference_record = reference_records.get(i, None)
+        if reference_record is not None and reference_record["status"] != "ok":
+            raise ConfigurationError(
+                f'The reference solution code failed to run on method test ({i}) "{method_test_name(test)}" with error:\n\n{format_record_error(test, reference_record)}'
+            )
+
+        class_name, method_name, args, expected, kwargs = test
+        if callable(expected):
+            diff_limits = diff_limits or {}
+            expected = isolate_function(
+                expected,
+                f'The comparator {expected} on method test ({i}) "{method_test_name(test)}"',
+                diff_limits.get("timeout", None),
+                diff_limits.get("memory", None),
+                isolation_pool,
+            )
+
+        results.append(
+            compile_method_test_result(
+                (class_name, method_name, args, expected, kwargs),
+                student_records[i],
+                reference_record,
+            )
+        )
+
+    return execution_time, results
+
+
+def run_driver(
+    tests: list[tuple[str, str, list[Any], Any, dict[str, Any]]],
+    case_ids: Iterable[int],
+    build_dir: str,
+    side_dir: str,
+    side_classpath: str,
+    relaunches: Iterable[int] = (),
+) -> tuple[dict[int, dict[str, Any]], float, list[int]]:
+    """
+    Runs the given cases in the driver, relaunching it for the remaining
+    cases whenever the program under test exits the JVM, a case times out,
+    or the next case is in `relaunches`. Also returns the cases the driver
+    was relaunched before.
+    """
+
+    records: dict[int, dict[str, Any]] = {}
+    remaining = list(case_ids)
+    launches: list[int] = []
+    total_run_time = 0.0
+    cases_path = Path(build_dir) / "cases.jsonl"
+    results_path = Path(build_dir) / "results.jsonl"
+    cmd = [
+        "java",
+        "-cp",
+        os.pathsep.join([build_dir, side_classpath]),
+        DRIVER_CLASS,
+        str(cases_path),
+        str(results_path),
+    ]
+    while remaining:
+        launches.append(remaining[0])
+        next_relaunch = min(
+            (i for i in relaunches if i > remaining[0]), default=None
+        )
+        batch = [
+            i for i in remaining if next_relaunch is None or i < next_relaunch
+        ]
+        with open(cases_path, "w") as cases_file:
+            for i in batch:
+                class_name, method_name, args, _, kwargs = tests[i]
+                case = {
+                    "case": i,
+                    "class": class_name,
+                    "method": method_name,
+                    "args": args,
+                    "timeout": int(kwargs.get("timeout", 1) * 1000),
+                }
+                cases_file.write(json.dumps(case) + "\n")
+
+        results_path.unlink(missing_ok=True)
+        timeout = DRIVER_GRACE_PERIOD + sum(
+            tests[i][4].get("timeout", 1) for i in batch
+        )
+        timed_run = timed_execution(time_limited_run)
+        result, execution_time = timed_run(
+            cmd, timeout, capture_output=True, cwd=side_dir
+        )
+        total_run_time += execution_time
+
+        finished: list[int] = []
+        if results_path.exists():
+            with open(results_path, "r") as results_file:
+                for line in results_file:
+                    record = json.loads(line)
+                    records[record["case"]] = record
+                    finished.append(record["case"])
+
+        remaining = [i for i in remaining if i not in records]
+        if not remaining:
+            break
+
+        if all(i in records for i in batch):
+            continue
+
+        if isinstance(result, TimeoutError):
+            for i in remaining:
+                records[i] = {"status": "timeout", "value": None}
+
+            break
+
+        if finished and records[finished[-1]]["status"] == "timeout":
+            # The driver stops after a timed out case, so its thread never
+            # runs alongside the remaining cases
+            continue
+
+        # The JVM stopped early, which the first unfinished case caused
+        stderr = result.stderr.decode("utf-8")
+        records[remaining.pop(0)] = {
+            "status": "error",
+            "value": None,
+            "error": f"The program stopped the JVM (exit code {result.returncode}).\n\n{stderr}".strip(),
+        }
+
+    return records, total_run_time, launches[1:]
+
+
+def compile_method_test_result(
+    test: tuple[str, str, list[Any], Any, dict[str, Any]],
+    student_record: dict[str, Any],
+    reference_record: dict[str, Any] | None,
+) -> dict[str, Any]:
+    """
+    Compile a method test result for Gradescope autograders.
+    """
+
+    _, _, _, expected, kwargs = test
+    test_result = kwargs.copy()
+    test_result.setdefault("name", method_test_name(test))
+    test_result["score"] = 0
+    test_result["status"] = "failed"
+    test_result["output"] = ""
+    if "visibility" not in test_result:
+        test_result["visibility"] = "visible"
+
+    if student_record["status"] != "ok":
+        test_result["output"] = (
+            f"Error:\n\n{format_record_error(test, student_record)}"
+        )
+        return test_result
+
+    student_value = student_record["value"]
+    test_result["output"] = f"Returned:\n\n{json.dumps(student_value)}"
+    if student_record.get("output"):
+        test_result["output"] += f"\n\nOutput:\n\n{student_record['output']}"
+
+    reference_value = (
+        None if reference_record is None else reference_record["value"]
+    )
+    if callable(expected):
+        diff_func = cast(Callable[[Any, Any], tuple[float, str]], expected)
+        score_percentage, feedback = validate_custom_diff_func_output(
+            diff_func, diff_func(student_value, reference_value)
+        )
+        if feedback:
+            test_result["output"] += f"\n\nFeedback:\n\n{feedback}"
+
+    else:
+        if expected is FROM_REFERENCE:
+            expected = reference_value
+
+        score_percentage = float(student_value == normalize_value(expected))
+
+    if score_percentage == 1:
+        test_result["status"] = "passed"
+
+    test_result["score"] = score_percentage * test_result["max_score"]
+    return test_result
+
+
+def format_record_error(
+    test: tuple[str, str, list[Any], Any, dict[str, Any]],
+    record: dict[str, Any],
+) -> str:
+    if record["status"] == "timeout":
+        timeout = test[4].get("timeout", 1)
+        return f"Time limit of {timeout} second(s) exceeded."
+
+    return record.get("error") or "Unknown error."
+
+
+def method_test_name(
+    test: tuple[str, str, list[Any], Any, dict[str, Any]],
+) -> str:
+    class_name, method_name, args, _, kwargs = test
+    if "name" in kwargs:
+        return kwargs["name"]
+
+    formatted_args = ", ".join(json.dumps(arg) for arg in args)
+    return f"{class_name}.{method_name}({formatted_args})"
+
+
+def normalize_value(value: Any) -> Any:
+    """
+    Converts a value to what it looks like after a JSON round trip, e.g.
+    tuples become lists, like the values returned by the driver.
+    """
+
+    return json.loads(json.dumps(value))
+
+
+def validate_method_tests(
+    tests_module: object,
+) -> list[tuple[str, str, list[Any], Any, dict[str, Any]]]:
+    """
+    Validates the optional METHOD_TESTS variable. Tests without an expected
+    value get FROM_REFERENCE as their expected value.
+
+    Raises:
+        ConfigurationError: If METHOD_TESTS is not an iterable, or any method
+            test does not conform to (class_name, method_name, args,
+            [optional expected value or comparator], gradescope_kwargs).
+    """
+
+    tests = getattr(tests_module, "METHOD_TESTS", None)
+    if tests is None:
+        return []
+
+    if isinstance(tests, (str, dict)) or not isinstance(tests, Iterable):
+        raise ConfigurationError(
+            "METHOD_TESTS variable must be a list, tuple, or iterable of method test configurations."
+        )
+
+    validated: list[tuple[str, str, list[Any], Any, dict[str, Any]]] = []
+    for i, test in enumerate(cast(Iterable[Any], tests)):
+        invalid_message = f'Invalid method test configuration for method test "{i}", must be (class_name, method_name, args, [optional expected value or comparator], gradescope_kwargs)'
+        if not isinstance(test, (list, tuple)) or len(test) not in (4, 5):  # type: ignore
+            raise ConfigurationError(invalid_message)
+
+        test = cast(list[Any], test)
+        if len(test) == 5:
+            class_name, method_name, args, expected, kwargs = test
+        else:
+            class_name, method_name, args, kwargs = test
+            expected = FROM_REFERENCE
+
+        if not (
+            isinstance(class_name, str)
+            and isinstance(method_name, str)
+            and isinstance(args, (list, tuple))
+            and isinstance(kwargs, dict)
+        ):
+            raise ConfigurationError(invalid_message)
+
+        if "max_score" not in kwargs:
+            raise ConfigurationError(
+                f'Invalid method test configuration for method test "{i}", max_score is required'
+            )
+
+        try:
+            args = normalize_value(args)
+            if not (expected is FROM_REFERENCE or callable(expected)):
+                normalize_value(expected)
+
+        except (TypeError, ValueError):
+            raise ConfigurationError(
+                f'Invalid method test configuration for method test "{i}", args and expected value must be JSON serializable'
+            )
+
+        validated.append(
+            (
+                class_name,
+                method_name,
+                args,
+                expected,
+                cast(dict[str, Any], kwargs),
+            )
+        )
+
+    return validated
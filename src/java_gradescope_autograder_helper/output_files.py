@@ -0,0 +1,280 @@
+import mmap
+import re
+from difflib import SequenceMatcher, unified_diff
+from functools import lru_cache
+from hashlib import sha256
+from pathlib import Path, PurePath
+from shutil import copy2
+from tempfile import mkdtemp
+
+# Bytes hashed or compared at a time, so huge files never sit in memory
+CHUNK_SIZE = 1024 * 1024
+# Bytes around the first difference shown in a diff snippet
+SNIPPET_CONTEXT = 2048
+# Lines of a diff snippet shown at most
+MAX_SNIPPET_LINES = 20
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@$")
+
+
+def prepare_work_dir(side_dir: str, output_files: tuple[str, ...]) -> str:
+    """
+    Creates a working directory for a single run with a copy of every entry
+    of `side_dir`, except the output files, so the program still finds its
+    input files while anything it writes lands in the new directory only.
+    """
+
+    work_dir = mkdtemp(prefix="autograder_run_")
+    copy_entries(
+        Path(side_dir),
+        Path(work_dir),
+        [PurePath(path) for path in output_files],
+    )
+    return work_dir
+
+
+def copy_entries(
+    source: Path, target: Path, output_paths: list[PurePath]
+) -> None:
+    for entry in source.iterdir():
+        if PurePath(entry.name) in output_paths:
+            continue
+
+        if entry.is_dir():
+            (target / entry.name).mkdir()
+            copy_entries(
+                entry,
+                target / entry.name,
+                [
+                    path.relative_to(entry.name)
+                    for path in output_paths
+                    if len(path.parts) > 1 and path.parts[0] == entry.name
+                ],
+            )
+
+        elif entry.is_file():
+            copy2(entry, target / entry.name)
+
+    for path in output_paths:
+        (target / path).parent.mkdir(parents=True, exist_ok=True)
+
+
+def compare_output_files(
+    reference_dir: str, student_dir: str, output_files: tuple[str, ...]
+) -> list[tuple[str, bool, str]]:
+    """
+    Compares every output file written by the reference solution to the one
+    written by the student, returning (path, matched, feedback) for each.
+    """
+
+    comparisons: list[tuple[str, bool, str]] = []
+    for path in output_files:
+        reference_path = Path(reference_dir) / path
+        student_path = Path(student_dir) / path
+        if not student_path.is_file():
+            comparisons.append((path, False, f'"{path}" was not created.'))
+            continue
+
+        reference_stat = reference_path.stat()
+        student_stat = student_path.stat()
+        if reference_stat.st_size == student_stat.st_size and file_digest(
+            str(reference_path),
+            reference_stat.st_size,
+            reference_stat.st_mtime_ns,
+        ) == file_digest(
+            str(student_path), student_stat.st_size, student_stat.st_mtime_ns
+        ):
+            comparisons.append((path, True, f'"{path}" matches.'))
+            continue
+
+        comparisons.append(
+            (
+                path,
+                False,
+                f'"{path}" does not match:\n\n{diff_snippet(reference_path, student_path)}',
+            )
+        )
+
+    return comparisons
+
+
+@lru_cache(maxsize=1024)
+def file_digest(path: str, size: int, mtime_ns: int) -> str:
+    """
+    Hashes a file through a memory map one chunk at a time. The size and
+    modification time are part of the cache key, so a rewritten file is
+    hashed again.
+    """
+
+    digest = sha256()
+    if size == 0:
+        return digest.hexdigest()
+
+    with (
+        open(path, "rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+    ):
+        for start in range(0, len(mapped), CHUNK_SIZE):
+            digest.update(mapped[start : start + CHUNK_SIZE])
+
+    return digest.hexdigest()
+
+
+def first_difference(reference_path: Path, student_path: Path) -> int:
+    """
+    Returns the offset of the first differing byte, reading both files one
+    chunk at a time.
+    """
+
+    with (
+        open(reference_path, "rb") as reference,
+        open(student_path, "rb") as student,
+    ):
+        offset = 0
+        while True:
+            expected = reference.read(CHUNK_SIZE)
+            actual = student.read(CHUNK_SIZE)
+            if expected != actual:
+                for i, (a, b) in enumerate(zip(expected, actual)):
+                    if a != b:
+                        return offset + i
+
+                return offset + min(len(expected), len(actual))
+
+            if not expected:
+                return offset
+
+            offset += len(expected)
+
+
+def diff_snippet(reference_path: Path, student_path: Path) -> str:
+    """
+    Returns a unified diff of the lines around the first difference for text
+    files, or the offset of the first difference for binary files.
+    """
+
+    offset = first_difference(reference_path, student_path)
+    start = max(offset - SNIPPET_CONTEXT, 0)
+    if start:
+        # Both files are equal before the difference, so the snippet starts
+        # on the same line in both
+        prefix = read_range(reference_path, start, offset - start, False)
+        if b"\n" in prefix:
+            start += prefix.index(b"\n") + 1
+
+    expected_data = read_range(reference_path, start)
+    actual_data = read_range(student_path, start)
+    expected = decode_text(expected_data)
+    actual = decode_text(actual_data)
+    reference_size = reference_path.stat().st_size
+    student_size = student_path.stat().st_size
+    sizes = f"({reference_size} bytes expected, {student_size} bytes written)"
+    if expected is None or actual is None:
+        return f"Files differ starting at byte {offset} {sizes}."
+
+    expected_lines = expected.splitlines()
+    actual_lines = actual.splitlines()
+    opcodes = SequenceMatcher(
+        None, expected_lines, actual_lines, autojunk=False
+    ).get_opcodes()
+    tag, i1, _, j1, _ = opcodes[-1] if opcodes else ("equal", 0, 0, 0, 0)
+    # A snippet that does not reach the end of its file stops at a different
+    # line than the other one, lines only missing past it are no difference
+    if tag == "delete" and start + len(actual_data) < student_size:
+        expected_lines = expected_lines[:i1]
+
+    elif tag == "insert" and start + len(expected_data) < reference_size:
+        actual_lines = actual_lines[:j1]
+
+    first_line = count_lines(reference_path, start)
+    diff = [
+        renumber_hunk(line, first_line)
+        for line in unified_diff(
+            expected_lines,
+            actual_lines,
+            "expected",
+            "written",
+            lineterm="",
+        )
+    ]
+    if not diff:
+        return f"Files differ starting at byte {offset} {sizes}, only in their line endings."
+
+    if len(diff) > MAX_SNIPPET_LINES:
+        diff = diff[:MAX_SNIPPET_LINES] + ["..."]
+
+    return f"Files differ starting at byte {offset} {sizes}:\n\n" + "\n".join(
+        diff
+    )
+
+
+def renumber_hunk(line: str, first_line: int) -> str:
+    """
+    Shifts the line numbers of a hunk header, which count from the start of
+    the snippet, to count from the start of the file.
+    """
+
+    match = HUNK_HEADER.match(line)
+    if match is None:
+        return line
+
+    expected_start, expected_count, actual_start, actual_count = match.groups()
+    return (
+        f"@@ -{int(expected_start) + first_line}{expected_count or ''}"
+        f" +{int(actual_start) + first_line}{actual_count or ''} @@"
+    )
+
+
+def count_lines(path: Path, end: int) -> int:
+    """
+    Returns the number of lines before byte `end`, reading one chunk at a
+    time.
+    """
+
+    lines = 0
+    with open(path, "rb") as file:
+        while file.tell() < end:
+            lines += file.read(min(CHUNK_SIZE, end - file.tell())).count(b"\n")
+
+    return lines
+
+
+def read_range(
+    path: Path,
+    start: int,
+    size: int = 2 * SNIPPET_CONTEXT,
+    whole_lines: bool = True,
+) -> bytes:
+    """
+    Reads `size` bytes from `start`. With `whole_lines`, a range that does
+    not reach the end of the file is cut back to its last newline, so it
+    never ends in the middle of a line.
+    """
+
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(size)
+
+    if whole_lines and len(data) == size and b"\n" in data:
+        return data[: data.rindex(b"\n") + 1]
+
+    return data
+
+
+def decode_text(data: bytes) -> str | None:
+    """
+    Decodes a range of a UTF-8 text file, which may cut a multi-byte
+    character at either end, or returns None for binary data.
+    """
+
+    if b"\0" in data:
+        return None
+
+    for cut_start in range(4):
+        for cut_end in range(4):
+            try:
+                return data[cut_start : len(data) - cut_end].decode("utf-8")
+
+            except UnicodeDecodeError:
+                continue
+
+    return None
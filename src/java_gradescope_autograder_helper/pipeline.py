@@ -0,0 +1,190 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass
+from time import time
+from typing import Any, Callable
+
+from .helpers import ConfigurationError
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A node in the autograder pipeline.
+
+    A stage starts once every stage in `depends_on` has finished. Stages in
+    `awaits` do not hold back the start, but their results can still be read
+    from inside `func`, which blocks until they are available.
+    """
+
+    name: str
+    func: Callable[["StageResults"], Any]
+    depends_on: tuple[str, ...] = ()
+    awaits: tuple[str, ...] = ()
+
+
+class StageResults:
+    """
+    Read-only view of the results of the stages a stage declared it needs.
+    """
+
+    def __init__(self, stage: Stage, futures: dict[str, Future[Any]]):
+        self._stage = stage
+        self._futures = futures
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._stage.depends_on + self._stage.awaits:
+            raise ConfigurationError(
+                f'Stage "{self._stage.name}" tried reading the result of stage "{name}" without depending on it.'
+            )
+
+        return self._futures[name].result()
+
+
+def run_stages(
+    stages: list[Stage],
+    durations: dict[str, tuple[float, str]] | None = None,
+    max_running: int | None = None,
+) -> dict[str, Any]:
+    """
+    Run the stages as their dependencies allow, at most `max_running` at
+    once, and return the result of every stage by name. The wall time and
+    status of every stage that ran is stored in `durations`.
+
+    Raises:
+        ConfigurationError: If the stages do not form a valid dependency
+            graph.
+        Exception: The first exception raised by any stage, after every
+            stage already running has finished.
+    """
+
+    validate_stage_graph(stages)
+
+    futures: dict[str, Future[Any]] = {
+        stage.name: Future() for stage in stages
+    }
+    pending = list(stages)
+    running: dict[Future[Any], Stage] = {}
+    error: BaseException | None = None
+
+    def run_stage(stage: Stage) -> None:
+        start = time()
+        try:
+            futures[stage.name].set_result(
+                stage.func(StageResults(stage, futures))
+            )
+            status = "ok"
+        except BaseException as e:
+            futures[stage.name].set_exception(e)
+            status = "error"
+
+        if durations is not None:
+            durations[stage.name] = (time() - start, status)
+
+    with ThreadPoolExecutor(max_workers=len(stages) or 1) as executor:
+        while pending or running:
+            if error is None:
+                for stage in [s for s in pending if is_ready(s, futures)]:
+                    # Stages that running stages await start regardless, so
+                    # an awaiting stage never waits on one that cannot start
+                    if (
+                        max_running is not None
+                        and len(running) >= max_running
+                        and stage.name
+                        not in required_stages(list(running.values()), stages)
+                    ):
+                        continue
+
+                    pending.remove(stage)
+                    running[executor.submit(run_stage, stage)] = stage
+
+            if not running:
+                # Only stages skipped because of an error are left
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                stage_error = futures[stage.name].exception()
+                if stage_error is not None and error is None:
+                    error = stage_error
+                    # Unblock running stages awaiting stages that will now
+                    # never start
+                    for skipped in pending:
+                        futures[skipped.name].set_exception(error)
+
+    if error is not None:
+        raise error
+
+    return {name: future.result() for name, future in futures.items()}
+
+
+def is_ready(stage: Stage, futures: dict[str, Future[Any]]) -> bool:
+    return all(futures[name].done() for name in stage.depends_on)
+
+
+def required_stages(required_by: list[Stage], stages: list[Stage]) -> set[str]:
+    """
+    Returns the names of every stage the given stages need, directly or
+    through other stages.
+    """
+
+    by_name = {stage.name: stage for stage in stages}
+    required: set[str] = set()
+    queue = [
+        name
+        for stage in required_by
+        for name in stage.depends_on + stage.awaits
+    ]
+    while queue:
+        name = queue.pop()
+        if name not in required:
+            required.add(name)
+            queue.extend(by_name[name].depends_on + by_name[name].awaits)
+
+    return required
+
+
+def validate_stage_graph(stages: list[Stage]) -> None:
+    """
+    Validates that stage names are unique, every dependency exists, and the
+    dependencies do not form a cycle.
+
+    Raises:
+        ConfigurationError: If any of the above does not hold.
+    """
+
+    names = [stage.name for stage in stages]
+    for name in names:
+        if names.count(name) > 1:
+            raise ConfigurationError(
+                f'Stage "{name}" is defined more than once.'
+            )
+
+    for stage in stages:
+        for dependency in stage.depends_on + stage.awaits:
+            if dependency not in names:
+                raise ConfigurationError(
+                    f'Stage "{stage.name}" depends on unknown stage "{dependency}".'
+                )
+
+    # Kahn's algorithm, both kinds of dependencies can deadlock if cyclic
+    remaining = {
+        stage.name: set(stage.depends_on + stage.awaits) for stage in stages
+    }
+    while remaining:
+        free = [name for name, deps in remaining.items() if not deps]
+        if not free:
+            raise ConfigurationError(
+                f"Stages {sorted(remaining)} have cyclic dependencies."
+            )
+
+        for name in free:
+            del remaining[name]
+
+        for deps in remaining.values():
+            deps.difference_update(free)
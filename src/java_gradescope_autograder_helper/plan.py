@@ -0,0 +1,318 @@
+import json
+import os
+import sys
+from dataclasses import dataclass
+from hashlib import sha256
+from importlib import import_module
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable, cast
+
+from .helpers import (
+    ConfigurationError,
+    find_absolute_path,
+    fingerprint_sources,
+)
+from .loader import load_module
+
+PLAN_VERSION = 1
+PLAN_SUFFIX = ".plan.json"
+# Name the loader gives the tests module, functions defined in it can only be
+# resolved by loading it again, without the statements generating TESTS
+TESTS_MODULE_NAME = "tests"
+TESTS_VARIABLE = "TESTS"
+# Settings stored in the plan, validated again when it is loaded since that
+# is cheap next to TESTS
+PLANNED_SETTINGS = (
+    "ENTRY_POINT",
+    "CLASSPATH",
+    "CHECK_STYLE",
+    "COMPILE_ALL",
+    "DIFF_FUNCTION_LIMITS",
+    "PROFILE",
+    "TIMEOUT_POLICY",
+    "DIFF_CACHE",
+    "JVM_POOL",
+)
+# Settings holding functions, the tests module is loaded when any is set
+MODULE_SETTINGS = ("METHOD_TESTS", "STAGES")
+
+
+@dataclass
+class Plan:
+    """
+    A fresh plan, with the tests module, or a stand-in holding the planned
+    settings when nothing needs the module itself.
+    """
+
+    module: object
+    tests: list[Any]
+    reference_entry_point_path: str
+
+
+def plan_path(tests_file_path: str) -> Path:
+    """
+    Returns the path of the plan of a tests file, next to it, so it is zipped
+    with the autograder.
+    """
+
+    path = Path(tests_file_path)
+    return path.with_name(path.stem + PLAN_SUFFIX)
+
+
+def hash_file(path: str) -> str:
+    with open(path, "rb") as file:
+        return sha256(file.read()).hexdigest()
+
+
+def function_reference(func: Callable[..., Any], test: int) -> str:
+    """
+    Returns the "module:qualname" reference of a diff function.
+
+    Raises:
+        ConfigurationError: If the function cannot be found again by its
+            reference, like lambdas and functions defined inside others.
+    """
+
+    module_name = getattr(func, "__module__", None)
+    qualname = getattr(func, "__qualname__", "")
+    if module_name is None or "<" in qualname:
+        raise ConfigurationError(
+            f'The diff function of test "{test}" cannot be planned, it must be defined at the top level of a module.'
+        )
+
+    return f"{module_name}:{qualname}"
+
+
+def resolve_reference(
+    reference: str, load_tests_module: Callable[[], object]
+) -> Callable[..., Any]:
+    """
+    Returns the function a "module:qualname" reference points to.
+    """
+
+    module_name, qualname = reference.split(":", 1)
+    if module_name == TESTS_MODULE_NAME:
+        value: Any = load_tests_module()
+
+    else:
+        try:
+            value = import_module(module_name)
+
+        except ImportError:
+            # Helper modules next to the tests file are only importable
+            # once the tests module imported them
+            load_tests_module()
+            value = sys.modules[module_name]
+
+    for name in qualname.split("."):
+        value = getattr(value, name)
+
+    return cast(Callable[..., Any], value)
+
+
+def write_plan(
+    tests_file_path: str,
+    source_dir: str,
+    tests_module: object,
+    tests: Iterable[Any],
+    reference_entry_point_path: str,
+) -> Path:
+    """
+    Writes the plan of an already validated tests module: its tests, its
+    settings, and the hashes that tell when it is stale.
+
+    Raises:
+        ConfigurationError: If a diff function cannot be referenced or a test
+            or setting cannot be stored as JSON.
+    """
+
+    module_settings = [
+        name
+        for name in MODULE_SETTINGS
+        if getattr(tests_module, name, None) is not None
+    ]
+    module_references: set[str] = set()
+    planned_tests: list[list[Any]] = []
+    for i, test in enumerate(tests):
+        if len(test) == 3:
+            args, func, kwargs = test
+            reference = function_reference(func, i)
+            if resolve_reference(reference, lambda: tests_module) is not func:
+                raise ConfigurationError(
+                    f'The diff function of test "{i}" cannot be planned, "{reference}" refers to a different function.'
+                )
+
+            if reference.startswith(f"{TESTS_MODULE_NAME}:"):
+                module_references.add(reference)
+
+            planned_tests.append([args, reference, kwargs])
+
+        else:
+            planned_tests.append(list(test))
+
+    if module_settings or module_references:
+        check_definitions(
+            tests_file_path, module_settings, sorted(module_references)
+        )
+
+    settings: dict[str, Any] = {}
+    for name in PLANNED_SETTINGS:
+        value = getattr(tests_module, name, None)
+        if value is not None:
+            settings[name] = value
+
+    autograder_dir = os.getcwd()
+    if "CLASSPATH" in settings:
+        settings["CLASSPATH"] = os.path.relpath(
+            find_absolute_path(settings["CLASSPATH"]), autograder_dir
+        )
+
+    config_file = settings.get("CHECK_STYLE", {}).get("config_file", None)
+    if config_file is not None:
+        settings["CHECK_STYLE"] = {
+            **settings["CHECK_STYLE"],
+            "config_file": os.path.relpath(
+                find_absolute_path(config_file), autograder_dir
+            ),
+        }
+
+    plan = {
+        "version": PLAN_VERSION,
+        "tests_hash": hash_file(tests_file_path),
+        "sources": fingerprint_sources(
+            str(Path(reference_entry_point_path).parent)
+        ),
+        "reference_entry_point": os.path.relpath(
+            reference_entry_point_path, source_dir
+        ),
+        "module_required": bool(module_settings or module_references),
+        "settings": settings,
+        "tests": planned_tests,
+    }
+    try:
+        text = json.dumps(plan)
+
+    except (TypeError, ValueError) as e:
+        raise ConfigurationError(
+            f"The tests configuration cannot be planned, every test and setting must be JSON serializable: {e}"
+        )
+
+    path = plan_path(tests_file_path)
+    path.write_text(text)
+    return path
+
+
+def check_definitions(
+    tests_file_path: str, settings: list[str], references: list[str]
+) -> None:
+    """
+    Checks that the settings and functions a plan needs from the tests
+    module are still defined when it is loaded without generating TESTS.
+
+    Raises:
+        ConfigurationError: If any of them is only defined by a statement
+            using TESTS.
+    """
+
+    definitions = load_module(tests_file_path, skipped=TESTS_VARIABLE)
+    for name in settings:
+        if getattr(definitions, name, None) is None:
+            raise ConfigurationError(
+                f"{name} cannot be planned, it must not be defined by a statement using {TESTS_VARIABLE}."
+            )
+
+    for reference in references:
+        try:
+            resolve_reference(reference, lambda: definitions)
+
+        except AttributeError:
+            raise ConfigurationError(
+                f'The diff function "{reference}" cannot be planned, it must not be defined by a statement using {TESTS_VARIABLE}.'
+            )
+
+
+def read_plan(tests_file_path: str, source_dir: str) -> Plan | None:
+    """
+    Returns the plan of a tests file, or None if there is none or it is
+    stale: tests.py or the reference sources changed since it was written.
+    Functions in the plan are resolved, loading the tests module only when a
+    function or a setting needs it, and without generating TESTS.
+    """
+
+    path = plan_path(tests_file_path)
+    if not path.exists():
+        return None
+
+    try:
+        plan = json.loads(path.read_text())
+        reference_entry_point_path = str(
+            Path(source_dir) / plan["reference_entry_point"]
+        )
+        fresh = (
+            plan["version"] == PLAN_VERSION
+            and plan["tests_hash"] == hash_file(tests_file_path)
+            and Path(reference_entry_point_path).is_file()
+            and plan["sources"]
+            == fingerprint_sources(
+                str(Path(reference_entry_point_path).parent)
+            )
+        )
+
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f'Could not read the plan "{path}": {e}')
+        return None
+
+    if not fresh:
+        print(
+            f'The plan "{path}" is stale, validating "{tests_file_path}" instead. Run `autograder plan` again.'
+        )
+        return None
+
+    tests_module: list[object] = []
+
+    def load_tests_module() -> object:
+        if not tests_module:
+            tests_module.append(
+                load_module(tests_file_path, skipped=TESTS_VARIABLE)
+            )
+
+        return tests_module[0]
+
+    functions: dict[str, Callable[..., Any]] = {}
+    tests: list[Any] = []
+    for test in plan["tests"]:
+        if len(test) == 3:
+            args, reference, kwargs = test
+            if reference not in functions:
+                try:
+                    functions[reference] = resolve_reference(
+                        reference, load_tests_module
+                    )
+
+                except (ImportError, AttributeError, KeyError):
+                    # A module tests.py imports changed
+                    print(
+                        f'The plan "{path}" is stale, "{reference}" no longer exists. Validating "{tests_file_path}" instead.'
+                    )
+                    return None
+
+            tests.append((args, functions[reference], kwargs))
+
+        else:
+            tests.append(tuple(test))
+
+    if plan["module_required"]:
+        # The planned settings are used even so, for their resolved paths
+        module = SimpleNamespace(
+            **{
+                name: getattr(load_tests_module(), name, None)
+                for name in MODULE_SETTINGS
+            },
+            **plan["settings"],
+        )
+
+    else:
+        module = SimpleNamespace(**plan["settings"])
+
+    return Plan(module, tests, reference_entry_point_path)
@@ -0,0 +1,138 @@
+import json
+import os
+from collections import Counter
+from subprocess import TimeoutExpired, run
+from typing import Any
+
+# Directory inside the results directory where recordings are kept
+PROFILES_DIR = "profiles"
+# Seconds the JDK tools get to dump or read a recording
+TOOL_TIMEOUT = 30
+# Seconds a recorded run gets on top of the test's time limit, since the
+# recorder takes a while to start
+RECORDING_GRACE_PERIOD = 5
+# Number of frames kept from the most sampled stack
+STACK_DEPTH = 10
+# Samples of the recorder itself starting up or writing are not the program's
+RECORDER_PACKAGE = "jdk.jfr."
+
+
+def recording_options(recording_path: str) -> list[str]:
+    """
+    Returns the JVM options that start a Java Flight Recorder recording,
+    written to `recording_path` when the JVM exits, without printing the
+    recorder's startup messages to the program's output.
+    """
+
+    return [
+        "-Xlog:jfr+startup=error",
+        f"-XX:StartFlightRecording=dumponexit=true,filename={recording_path},settings=profile",
+    ]
+
+
+def dump_recording(pid: int, recording_path: str) -> None:
+    """
+    Asks a running JVM to write its recording, since a JVM that is killed
+    for exceeding its time limit never writes it on exit.
+    """
+
+    try:
+        run(
+            ["jcmd", str(pid), "JFR.dump", f"filename={recording_path}"],
+            capture_output=True,
+            timeout=TOOL_TIMEOUT,
+            check=False,
+        )
+
+    except (OSError, TimeoutExpired):
+        pass
+
+
+def summarize_recording(recording_path: str, top: int) -> dict[str, Any]:
+    """
+    Returns the `top` methods most often running when the recording sampled
+    the program, and the most sampled stack. Only the recording path is
+    returned when the recording cannot be read, and nothing when it is
+    missing or empty.
+    """
+
+    if not os.path.exists(recording_path) or not os.path.getsize(
+        recording_path
+    ):
+        return {}
+
+    summary: dict[str, Any] = {"recording": recording_path}
+    # Any other layout of the recorder's output only loses the profile
+    try:
+        result = run(
+            [
+                "jfr",
+                "print",
+                "--json",
+                "--events",
+                "jdk.ExecutionSample",
+                recording_path,
+            ],
+            capture_output=True,
+            timeout=TOOL_TIMEOUT,
+            check=False,
+        )
+        events = json.loads(result.stdout)["recording"]["events"]
+        methods: Counter[str] = Counter()
+        stacks: Counter[tuple[str, ...]] = Counter()
+        for event in events:
+            stack_trace = event["values"].get("stackTrace") or {}
+            frames = stack_trace.get("frames") or []
+            if not frames or format_method(frames[0]).startswith(
+                RECORDER_PACKAGE
+            ):
+                continue
+
+            methods[format_method(frames[0])] += 1
+            stacks[
+                tuple(format_frame(frame) for frame in frames[:STACK_DEPTH])
+            ] += 1
+
+    except (
+        OSError,
+        TimeoutExpired,
+        ValueError,
+        KeyError,
+        TypeError,
+        AttributeError,
+    ):
+        return summary
+
+    samples = sum(methods.values())
+    summary["samples"] = samples
+    summary["hot_methods"] = [
+        f"{method}: {count / samples:.0%} of samples"
+        for method, count in methods.most_common(top)
+    ]
+    summary["hottest_stack"] = (
+        list(stacks.most_common(1)[0][0]) if stacks else []
+    )
+    return summary
+
+
+def format_method(frame: dict[str, Any]) -> str:
+    method = frame["method"]
+    class_name = method["type"]["name"].replace("/", ".")
+    return f"{class_name}.{method['name']}"
+
+
+def format_frame(frame: dict[str, Any]) -> str:
+    return f"{format_method(frame)} (line {frame.get('lineNumber', '?')})"
+
+
+def format_profile(summary: dict[str, Any]) -> str:
+    """
+    Formats a recording summary as test feedback.
+    """
+
+    if not summary.get("hot_methods"):
+        return "No samples were recorded."
+
+    hot_methods = "\n".join(summary["hot_methods"])
+    stack = "\n".join(f"  at {frame}" for frame in summary["hottest_stack"])
+    return f"Most time was spent in:\n{hot_methods}\n\nMost sampled stack:\n{stack}"
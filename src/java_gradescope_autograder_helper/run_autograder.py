@@ -1,21 +1,118 @@
 import json
-from pathlib import Path
-from typing import Any, Callable, cast
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path, PurePath
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import time
+from typing import Any, Callable, Iterable, Iterator, cast
 
-from .checkstyle.checkstyle import check_style
+from .checkstyle.checkstyle import check_style, validate_checkstyle_config
 from .compiler import compile_java
+from .diff_cache import DiffCache
 from .helpers import (
     RESULTS_DIR,
     SOURCE_DIR,
     SUBMISSION_DIR,
     ConfigurationError,
     find_absolute_path,
+    fingerprint,
+    fingerprint_sources,
 )
+from .history import record_run
+from .isolation import IsolationPool
+from .jvm_pool.jvm_pool import JvmPool, available_cores, compile_launcher
 from .loader import load_module
-from .test_runner import run_tests
+from .method_tests.method_tests import (
+    run_method_tests,
+    validate_method_tests,
+)
+from .pipeline import Stage, StageResults, run_stages
+from .plan import hash_file, read_plan, write_plan
+from .profiling import PROFILES_DIR
+from .sharding import (
+    read_timings,
+    select_shard,
+    shard_file_name,
+    write_timings,
+)
+from .test_runner import run_tests, time_reference
+from .test_sources import sample
+from .timeouts import read_calibration, write_calibration
+
+DEFAULT_DIFF_FUNCTION_LIMITS = {"timeout": 10, "memory": 1024}
+DEFAULT_PROFILE = {
+    "slow": None,
+    "top": 5,
+    "feedback": False,
+    "max_runs": 5,
+    "budget": 60,
+}
+DEFAULT_DIFF_CACHE = {"size": 4096, "persist": False}
+DEFAULT_JVM_POOL = {"size": 1}
+DEFAULT_TIMEOUT_POLICY = {
+    "factor": 3,
+    "floor": 0.5,
+    "cap": 10,
+    "source": "run",
+}
+
+BUILT_IN_STAGES = (
+    "resolve",
+    "compile_reference",
+    "compile_submission",
+    "compile_launcher",
+    "run_tests",
+    "run_method_tests",
+    "check_style",
+)
+
+
+@dataclass
+class IncrementalState:
+    """
+    Kept between runs by `autograder run --watch` to only redo the work
+    affected by a change. The watcher discards the compiled side, with its
+    build directory, and every cached result when Java sources change.
+    """
+
+    compile_key: str | None = None
+    compiled: set[str] = field(default_factory=set)
+    build_dirs: dict[str, str] = field(default_factory=dict)
+    test_results: dict[str, dict[str, Any]] = field(default_factory=dict)
+    diff_cache: DiffCache | None = None
+    stage_results: dict[str, tuple[str, Any]] = field(default_factory=dict)
 
+    def invalidate(
+        self, sides: tuple[str, ...] = ("reference", "submission")
+    ) -> None:
+        self.compiled.difference_update(sides)
+        for side in sides:
+            build_dir = self.build_dirs.pop(side, None)
+            if build_dir is not None:
+                rmtree(build_dir, ignore_errors=True)
+
+        self.test_results.clear()
+        self.stage_results.clear()
+
+
+def run_autograder(
+    tests_file_name: str,
+    state: IncrementalState | None = None,
+    shard: tuple[int, int] | None = None,
+) -> dict[str, Any]:
+    """
+    Grades the submission and writes the results.
+
+    With a `shard` (i, n), only the i-th of n balanced parts of TESTS runs,
+    and the partial results are written for `autograder merge`. Method tests,
+    the style check, and custom stages only run on the first shard.
+    """
+
+    started_at = datetime.now()
+    start = time()
 
-def run_autograder(tests_file_name: str) -> None:
     # Check if we're running in the "autograder" directory
     current_path = Path.cwd()
     if current_path.name != "autograder":
@@ -28,58 +125,489 @@ def run_autograder(tests_file_name: str) -> None:
     absolute_tests_file_path = find_absolute_path(
         tests_file_name, cwd=absolute_source_path
     )
-    tests_module = load_module(absolute_tests_file_path)
+    plan = read_plan(absolute_tests_file_path, absolute_source_path)
+    if plan is None:
+        tests_module = load_module(absolute_tests_file_path)
+        tests = validate_test_list(tests_module)
+        planned_entry_point_path = None
+
+    else:
+        tests_module = plan.module
+        tests = iter(plan.tests)
+        planned_entry_point_path = plan.reference_entry_point_path
 
     entry_point_name = validate_entry_point(tests_module)
+    method_tests = validate_method_tests(tests_module)
+    diff_limits = validate_diff_function_limits(tests_module)
+    custom_stages = validate_custom_stages(tests_module)
+    profile = validate_profile_config(tests_module)
+    compile_all = validate_compile_all(tests_module)
+    timeout_policy = validate_timeout_policy(tests_module)
+    diff_cache_config = validate_diff_cache_config(tests_module)
+    jvm_pool_config = validate_jvm_pool_config(tests_module)
+    if jvm_pool_config is not None and available_cores() < 2:
+        # Parked JVMs would start on the core the tests run on, slowing them
+        # down instead of starting ahead of them
+        print("Not using JVM_POOL, it needs more than one core.")
+        jvm_pool_config = None
+    check_style_config = getattr(tests_module, "CHECK_STYLE", None)
 
-    # Compiling
-    reference_entry_point_path = find_absolute_path(
-        entry_point_name,
-        absolute_source_path,
+    timings: dict[str, float] = {}
+    stage_durations: dict[str, tuple[float, str]] = {}
+    test_records: list[dict[str, Any]] = []
+    launch_stats: dict[str, int] = {}
+    test_indices: list[int] | None = None
+    if shard is not None:
+        indexed_tests = select_shard(list(tests), shard, read_timings())
+        test_indices = [i for i, _ in indexed_tests]
+        tests = iter([test for _, test in indexed_tests])
+        if shard[0] != 1:
+            method_tests = []
+            custom_stages = []
+            check_style_config = None
+
+    if state is not None:
+        compile_key = fingerprint(
+            (
+                entry_point_name,
+                getattr(tests_module, "CLASSPATH", None),
+                compile_all,
+            )
+        )
+        if state.compile_key != compile_key:
+            state.invalidate()
+            state.compile_key = compile_key
+
+    # Pure diff function results survive regrades in watch mode until
+    # tests.py changes, since they only depend on the outputs and tests.py
+    tests_hash = hash_file(absolute_tests_file_path)
+    if (
+        state is not None
+        and state.diff_cache is not None
+        and (
+            state.diff_cache.size,
+            state.diff_cache.persist,
+            state.diff_cache.tests_hash,
+        )
+        == (
+            diff_cache_config["size"],
+            diff_cache_config["persist"],
+            tests_hash,
+        )
+    ):
+        diff_cache = state.diff_cache
+
+    else:
+        diff_cache = DiffCache(**diff_cache_config, tests_hash=tests_hash)
+        if state is not None:
+            state.diff_cache = diff_cache
+
+    # Every run compiles into its own build directories, so concurrent runs,
+    # like shards on one machine, never overwrite each other's classes
+    build_dirs = {} if state is None else state.build_dirs
+    launcher_dirs: list[str] = []
+
+    def reusable(
+        name: str, key: Any, func: Callable[[StageResults], Any]
+    ) -> Callable[[StageResults], Any]:
+        def stage_func(results: StageResults) -> Any:
+            if state is None:
+                return func(results)
+
+            stage_fingerprint = fingerprint(key)
+            cached = state.stage_results.get(name, None)
+            if cached is not None and cached[0] == stage_fingerprint:
+                return cached[1]
+
+            result = func(results)
+            state.stage_results[name] = (stage_fingerprint, result)
+            return result
+
+        return stage_func
+
+    def resolve(results: StageResults) -> dict[str, str | None]:
+        reference_entry_point_path = (
+            planned_entry_point_path
+            or find_absolute_path(entry_point_name, absolute_source_path)
+        )
+        absolute_submission_dir = find_absolute_path(SUBMISSION_DIR)
+        submission_entry_point_path = find_absolute_path(
+            entry_point_name,
+            absolute_submission_dir,
+        )
+
+        classpath = getattr(tests_module, "CLASSPATH", None)
+        if classpath is not None:
+            classpath = find_absolute_path(classpath)
+
+        paths: dict[str, str | None] = {
+            "reference_entry_point_path": reference_entry_point_path,
+            "submission_entry_point_path": submission_entry_point_path,
+            "classpath": classpath,
+        }
+        for side in ("reference", "submission"):
+            entry_point_path = cast(str, paths[f"{side}_entry_point_path"])
+            side_dir = str(Path(entry_point_path).parent)
+            if compile_all:
+                classes_dir = side_dir
+
+            else:
+                if side not in build_dirs:
+                    build_dirs[side] = mkdtemp(prefix=f"autograder_{side}_")
+
+                classes_dir = build_dirs[side]
+
+            paths[f"{side}_dir"] = side_dir
+            paths[f"{side}_classes_dir"] = classes_dir
+            paths[f"{side}_classpath"] = os.pathsep.join(
+                [classes_dir] + ([classpath] if classpath else [])
+            )
+
+        if timeout_policy is not None:
+            timeout_policy["reference_times"] = (
+                read_calibration(
+                    absolute_source_path,
+                    fingerprint_sources(cast(str, paths["reference_dir"])),
+                )
+                if timeout_policy["source"] == "calibration"
+                else {}
+            )
+
+        if profile is not None:
+            profiles_dir = Path(find_absolute_path(RESULTS_DIR)) / PROFILES_DIR
+            profiles_dir.mkdir(parents=True, exist_ok=True)
+            profile["dir"] = str(profiles_dir)
+
+        return paths
+
+    def compile_side(side: str) -> Callable[[StageResults], None]:
+        def compile_stage(results: StageResults) -> None:
+            if state is not None and side in state.compiled:
+                return
+
+            paths = results["resolve"]
+            compile_java(
+                paths[f"{side}_entry_point_path"],
+                paths["classpath"],
+                None if compile_all else paths[f"{side}_classes_dir"],
+                {class_name for class_name, *_ in method_tests},
+            )
+            if state is not None:
+                state.compiled.add(side)
+
+        return compile_stage
+
+    def compile_launcher_stage(results: StageResults) -> str | None:
+        if jvm_pool_config is None:
+            return None
+
+        launcher_dir = mkdtemp(prefix="autograder_launcher_")
+        launcher_dirs.append(launcher_dir)
+        compile_launcher(launcher_dir)
+        return launcher_dir
+
+    def run_tests_stage(
+        results: StageResults,
+    ) -> tuple[float, list[dict[str, Any]]]:
+        paths = results["resolve"]
+        launcher_dir = results["compile_launcher"]
+        jvm_pool = None
+        if jvm_pool_config is not None:
+            jvm_pool = JvmPool(launcher_dir, jvm_pool_config["size"])
+
+        try:
+            return run_tests(
+                tests,
+                paths["reference_entry_point_path"],
+                paths["submission_entry_point_path"],
+                wait_for_submission=lambda: results["compile_submission"],
+                diff_limits=diff_limits,
+                result_cache=None if state is None else state.test_results,
+                timings=timings,
+                profile=profile,
+                records=test_records,
+                timeout_policy=timeout_policy,
+                diff_cache=diff_cache,
+                jvm_pool=jvm_pool,
+                reference_classpath=paths["reference_classpath"],
+                submission_classpath=paths["submission_classpath"],
+                isolation_pool=isolation_pool,
+                launch_stats=launch_stats,
+            )
+
+        finally:
+            if jvm_pool is not None:
+                jvm_pool.close()
+
+    def run_method_tests_stage(
+        results: StageResults,
+    ) -> tuple[float, list[dict[str, Any]]]:
+        paths = results["resolve"]
+        return run_method_tests(
+            method_tests,
+            paths["reference_dir"],
+            paths["submission_dir"],
+            paths["reference_classpath"],
+            paths["submission_classpath"],
+            diff_limits,
+            isolation_pool,
+        )
+
+    # Checkstyle only needs the submission sources, so it runs alongside the
+    # compilation and the tests.
+    # Documentation: https://checkstyle.sourceforge.io/cmdline.html
+    stages = [
+        Stage("resolve", resolve),
+        Stage("compile_reference", compile_side("reference"), ("resolve",)),
+        Stage("compile_submission", compile_side("submission"), ("resolve",)),
+        Stage("compile_launcher", compile_launcher_stage),
+        Stage(
+            "run_tests",
+            run_tests_stage,
+            ("resolve", "compile_reference", "compile_launcher"),
+            awaits=("compile_submission",),
+        ),
+        Stage(
+            "run_method_tests",
+            reusable(
+                "run_method_tests",
+                (method_tests, diff_limits),
+                run_method_tests_stage,
+            ),
+            ("resolve", "compile_reference", "compile_submission"),
+        ),
+        Stage(
+            "check_style",
+            reusable(
+                "check_style",
+                check_style_config,
+                lambda results: (
+                    check_style(tests_module)
+                    if check_style_config is not None
+                    else None
+                ),
+            ),
+        ),
+        *custom_stages,
+    ]
+    # Forked while this is the only thread, see IsolationPool
+    isolation_pool = None
+    if has_custom_functions(
+        tests_module, None if plan is None else plan.tests, method_tests
+    ):
+        isolation_pool = IsolationPool(available_cores())
+
+    try:
+        # Stages run at most one per core, so on small graders the timed
+        # student runs do not compete with javac, Checkstyle, or other JVMs
+        stage_results = run_stages(
+            stages, stage_durations, max_running=available_cores()
+        )
+
+    except BaseException:
+        record_run(
+            tests_file_name,
+            started_at,
+            time() - start,
+            "error",
+            shard,
+            stage_durations,
+            [],
+        )
+        raise
+
+    finally:
+        if isolation_pool is not None:
+            isolation_pool.close()
+
+        diff_cache.flush()
+        for launcher_dir in launcher_dirs:
+            rmtree(launcher_dir, ignore_errors=True)
+
+        if state is None:
+            for build_dir in build_dirs.values():
+                rmtree(build_dir, ignore_errors=True)
+
+    # Specification: https://gradescope-autograders.readthedocs.io/en/latest/specs/#output-format
+    execution_time, test_results = stage_results["run_tests"]
+    method_execution_time, method_test_results = stage_results[
+        "run_method_tests"
+    ]
+    final_json: dict[str, Any] = {
+        "execution_time": execution_time + method_execution_time,
+        "stdout_visibility": "visible",
+        "tests": test_results + method_test_results,
+        "extra_data": {"launches": launch_stats},
+    }
+
+    style_results = stage_results["check_style"]
+    if style_results:
+        final_json["tests"].append(style_results)
+
+    for stage in custom_stages:
+        final_json["tests"].extend(
+            validate_custom_stage_output(stage, stage_results[stage.name])
+        )
+
+    record_run(
+        tests_file_name,
+        started_at,
+        time() - start,
+        "ok",
+        shard,
+        stage_durations,
+        test_records,
     )
-    absolute_submission_dir = find_absolute_path(SUBMISSION_DIR)
-    submission_entry_point_path = find_absolute_path(
-        entry_point_name,
-        absolute_submission_dir,
+    if shard is None:
+        write_results(final_json)
+        write_timings(timings)
+
+    else:
+        # TESTS results come first, so merging only needs their indices
+        write_results(
+            {
+                **final_json,
+                "shard": list(shard),
+                "test_indices": test_indices,
+                "timings": timings,
+            },
+            shard_file_name(shard),
+        )
+
+    return final_json
+
+
+def calibrate_timeouts(tests_file_name: str) -> None:
+    """
+    Times the reference solution on every test, one run at a time on an
+    otherwise idle machine, and writes the times for a TIMEOUT_POLICY with a
+    "source" of "calibration".
+    """
+
+    current_path = Path.cwd()
+    if current_path.name != "autograder":
+        raise ConfigurationError(
+            f"The command `autograder calibrate` must be executed inside the 'autograder' directory, not \"{current_path.name}\""
+        )
+
+    absolute_source_path = find_absolute_path(SOURCE_DIR)
+    absolute_tests_file_path = find_absolute_path(
+        tests_file_name, cwd=absolute_source_path
     )
+    tests_module = load_module(absolute_tests_file_path)
 
-    # Compile Java
+    entry_point_name = validate_entry_point(tests_module)
+    tests = validate_test_list(tests_module)
+    compile_all = validate_compile_all(tests_module)
+    reference_entry_point_path = find_absolute_path(
+        entry_point_name, absolute_source_path
+    )
+    reference_dir = str(Path(reference_entry_point_path).parent)
     classpath = getattr(tests_module, "CLASSPATH", None)
     if classpath is not None:
         classpath = find_absolute_path(classpath)
 
-    compile_java(reference_entry_point_path, classpath)
-    compile_java(submission_entry_point_path, classpath)
+    build_dir = (
+        reference_dir
+        if compile_all
+        else mkdtemp(prefix="autograder_reference_")
+    )
+    try:
+        compile_java(
+            reference_entry_point_path,
+            classpath,
+            None if compile_all else build_dir,
+        )
+        reference_times = time_reference(
+            tests,
+            reference_entry_point_path,
+            os.pathsep.join([build_dir] + ([classpath] if classpath else [])),
+        )
 
-    # Run tests
-    # Specification: https://gradescope-autograders.readthedocs.io/en/latest/specs/#output-format
-    final_json: dict[str, float | str | list[dict[str, Any]]] = {
-        "execution_time": 0,
-        "stdout_visibility": "visible",
-        "tests": [],
-    }
+    finally:
+        if not compile_all:
+            rmtree(build_dir, ignore_errors=True)
 
-    tests = validate_test_list(tests_module)
-    execution_time, test_results = run_tests(
+    write_calibration(
+        absolute_source_path,
+        fingerprint_sources(reference_dir),
+        reference_times,
+    )
+    print(
+        f"Calibrated the reference solution on {len(reference_times)} tests."
+    )
+
+
+def plan_autograder(tests_file_name: str) -> None:
+    """
+    Validates the tests module and writes its plan, which `autograder run`
+    loads instead of generating and validating TESTS again, until tests.py or
+    the reference sources change.
+    """
+
+    current_path = Path.cwd()
+    if current_path.name != "autograder":
+        raise ConfigurationError(
+            f"The command `autograder plan` must be executed inside the 'autograder' directory, not \"{current_path.name}\""
+        )
+
+    absolute_source_path = find_absolute_path(SOURCE_DIR)
+    absolute_tests_file_path = find_absolute_path(
+        tests_file_name, cwd=absolute_source_path
+    )
+    tests_module = load_module(absolute_tests_file_path)
+
+    entry_point_name = validate_entry_point(tests_module)
+    tests = list(validate_test_list(tests_module))
+    validate_method_tests(tests_module)
+    validate_diff_function_limits(tests_module)
+    validate_custom_stages(tests_module)
+    validate_profile_config(tests_module)
+    validate_compile_all(tests_module)
+    validate_timeout_policy(tests_module)
+    validate_diff_cache_config(tests_module)
+    validate_jvm_pool_config(tests_module)
+    validate_checkstyle_config(tests_module)
+
+    path = write_plan(
+        absolute_tests_file_path,
+        absolute_source_path,
+        tests_module,
         tests,
-        reference_entry_point_path,
-        submission_entry_point_path,
+        find_absolute_path(entry_point_name, absolute_source_path),
     )
-    final_json["execution_time"] = execution_time
-    final_json["tests"] = test_results
+    print(f'Planned {len(tests)} tests in "{path}".')
 
-    # Check style
-    # Documentation: https://checkstyle.sourceforge.io/cmdline.html
-    style_results = check_style(tests_module)
-    if style_results:
-        final_json["tests"].append(style_results)
 
-    write_results(final_json)
+def has_custom_functions(
+    tests_module: object,
+    planned_tests: list[Any] | None,
+    method_tests: list[tuple[str, str, list[Any], Any, dict[str, Any]]],
+) -> bool:
+    """
+    Returns whether any test may have a diff function or comparator, which
+    is always the case for TESTS that are not a list or tuple, since they
+    cannot be looked at before they run.
+    """
+
+    if any(callable(test[3]) for test in method_tests):
+        return True
+
+    tests = planned_tests
+    if tests is None:
+        tests = getattr(tests_module, "TESTS", None)
+        if not isinstance(tests, (list, tuple)):
+            return True
+
+    return any(
+        isinstance(test, (list, tuple)) and len(test) == 3  # type: ignore
+        for test in cast(list[Any], tests)
+    )
 
 
 def validate_test_list(
     tests_module: object,
-) -> list[
+) -> Iterator[
     tuple[
         str,
         Callable[[str, str], tuple[float, str]],
@@ -89,12 +617,12 @@ def validate_test_list(
 ]:
     """
     Validates the tests module by ensuring that it contains a properly
-    configured TESTS variable.
+    configured TESTS variable, lazily as the returned iterator is consumed.
 
     Raises:
-        ConfigurationError: If TESTS is not found in tests_module, is not a
-            list, or any test configuration does not conform to the expected
-            structure.
+        ConfigurationError: If TESTS is not found in tests_module, is not an
+            iterable, or (lazily) any test configuration does not conform to
+            the expected structure.
     """
 
     tests = getattr(tests_module, "TESTS", None)
@@ -103,17 +631,40 @@ def validate_test_list(
             "TESTS variable not in the tests configuration file."
         )
 
-    if not isinstance(tests, (list, tuple)):
+    if isinstance(tests, (str, dict)) or not isinstance(tests, Iterable):
         raise ConfigurationError(
-            "TESTS variable must be a list or tuple of test configurations."
+            "TESTS variable must be a list, tuple, or iterable of test configurations."
         )
 
-    tests = cast(
-        list[Any],
-        tests,
-    )
+    tests = validate_tests(cast(Iterable[Any], tests))
+    sample_config = validate_sample_config(tests_module)
+    if sample_config is not None:
+        # Sampling has to see every test, but only keeps the sampled ones
+        tests = iter(
+            sample(tests, sample_config["size"], sample_config["seed"])
+        )
+
+    return tests
+
+
+def validate_tests(
+    tests: Iterable[Any],
+) -> Iterator[
+    tuple[
+        str,
+        Callable[[str, str], tuple[float, str]],
+        dict[str, Any],
+    ]
+    | tuple[str, dict[str, Any]],
+]:
+    """
+    Lazily validates every test configuration.
+
+    Raises:
+        ConfigurationError: If any test configuration does not conform to the
+            expected structure.
+    """
 
-    # Validate tests
     for i, test in enumerate(tests):
         if not isinstance(test, (list, tuple)):
             raise ConfigurationError(
@@ -145,7 +696,387 @@ def validate_test_list(
                 f'Invalid test configuration for test "{i}", max_score is required'
             )
 
-    return tests
+        stdin = kwargs.get("stdin", None)
+        if stdin is not None and not isinstance(stdin, str):
+            raise ConfigurationError(
+                f'Invalid test configuration for test "{i}", stdin must be a string'
+            )
+
+        env = kwargs.get("env", None)
+        if env is not None and not (
+            isinstance(env, dict)
+            and all(
+                isinstance(key, str) and isinstance(value, str)
+                for key, value in cast(dict[Any, Any], env).items()
+            )
+        ):
+            raise ConfigurationError(
+                f'Invalid test configuration for test "{i}", env must be a dictionary of strings to strings'
+            )
+
+        output_files = kwargs.get("output_files", None)
+        if output_files is not None and not (
+            isinstance(output_files, (list, tuple))
+            and output_files
+            and all(
+                isinstance(path, str)
+                and path
+                and not PurePath(path).is_absolute()
+                and ".." not in PurePath(path).parts
+                for path in cast(list[Any], output_files)
+            )
+        ):
+            raise ConfigurationError(
+                f'Invalid test configuration for test "{i}", output_files must be a non-empty list of relative file paths inside the working directory'
+            )
+
+        yield cast(Any, tuple(test))
+
+
+def validate_sample_config(tests_module: object) -> dict[str, int] | None:
+    """
+    Validates the optional SAMPLE variable, used to run a reproducible random
+    subset of the tests.
+
+    Raises:
+        ConfigurationError: If SAMPLE is not a dictionary with an integer
+            "size" and an optional integer "seed".
+    """
+
+    config = getattr(tests_module, "SAMPLE", None)
+    if config is None:
+        return None
+
+    if not isinstance(config, dict):
+        raise ConfigurationError('"SAMPLE" must be a dictionary')
+
+    sample_config = cast(dict[str, Any], config)
+    size = sample_config.get("size", None)
+    if not isinstance(size, int) or size < 0:
+        raise ConfigurationError(
+            '"SAMPLE.size" is required and must be a non-negative integer'
+        )
+
+    seed = sample_config.get("seed", 0)
+    if not isinstance(seed, int):
+        raise ConfigurationError('"SAMPLE.seed" must be an integer')
+
+    return {"size": size, "seed": seed}
+
+
+def validate_diff_function_limits(tests_module: object) -> dict[str, int]:
+    """
+    Validates the optional DIFF_FUNCTION_LIMITS variable, limiting every call
+    of a custom diff function to "timeout" seconds and "memory" megabytes.
+
+    Raises:
+        ConfigurationError: If DIFF_FUNCTION_LIMITS is not a dictionary or a
+            limit is not a positive integer.
+    """
+
+    config = getattr(tests_module, "DIFF_FUNCTION_LIMITS", None)
+    if config is None:
+        config = {}
+
+    if not isinstance(config, dict):
+        raise ConfigurationError('"DIFF_FUNCTION_LIMITS" must be a dictionary')
+
+    limits = {**DEFAULT_DIFF_FUNCTION_LIMITS, **cast(dict[str, Any], config)}
+    for key, value in limits.items():
+        if key not in DEFAULT_DIFF_FUNCTION_LIMITS:
+            raise ConfigurationError(
+                f'"DIFF_FUNCTION_LIMITS.{key}" is not a supported limit'
+            )
+
+        if not isinstance(value, int) or value <= 0:
+            raise ConfigurationError(
+                f'"DIFF_FUNCTION_LIMITS.{key}" must be a positive integer'
+            )
+
+    return limits
+
+
+def validate_compile_all(tests_module: object) -> bool:
+    """
+    Validates the optional COMPILE_ALL variable. By default only the entry
+    point and the classes it uses are compiled, into a separate build
+    directory. With COMPILE_ALL, every Java file next to or under the entry
+    point is compiled in place instead.
+
+    Raises:
+        ConfigurationError: If COMPILE_ALL is not a boolean.
+    """
+
+    compile_all = getattr(tests_module, "COMPILE_ALL", False)
+    if not isinstance(compile_all, bool):
+        raise ConfigurationError('"COMPILE_ALL" must be a boolean')
+
+    return compile_all
+
+
+def validate_profile_config(tests_module: object) -> dict[str, Any] | None:
+    """
+    Validates the optional PROFILE variable.
+
+    Raises:
+        ConfigurationError: If PROFILE is not a dictionary, "slow" is not a
+            positive number or None, "top" or "max_runs" is not a positive
+            integer, "budget" is not a positive number, or "feedback" is not
+            a boolean.
+    """
+
+    config = getattr(tests_module, "PROFILE", None)
+    if config is None:
+        return None
+
+    if not isinstance(config, dict):
+        raise ConfigurationError('"PROFILE" must be a dictionary')
+
+    profile = {**DEFAULT_PROFILE, **cast(dict[str, Any], config)}
+    for key in profile:
+        if key not in DEFAULT_PROFILE:
+            raise ConfigurationError(
+                f'"PROFILE.{key}" is not a supported option'
+            )
+
+    slow = profile["slow"]
+    if slow is not None and (
+        isinstance(slow, bool)
+        or not isinstance(slow, (int, float))
+        or slow <= 0
+    ):
+        raise ConfigurationError('"PROFILE.slow" must be a positive number')
+
+    top = profile["top"]
+    if isinstance(top, bool) or not isinstance(top, int) or top <= 0:
+        raise ConfigurationError('"PROFILE.top" must be a positive integer')
+
+    if not isinstance(profile["feedback"], bool):
+        raise ConfigurationError('"PROFILE.feedback" must be a boolean')
+
+    max_runs = profile["max_runs"]
+    if (
+        isinstance(max_runs, bool)
+        or not isinstance(max_runs, int)
+        or max_runs <= 0
+    ):
+        raise ConfigurationError(
+            '"PROFILE.max_runs" must be a positive integer'
+        )
+
+    budget = profile["budget"]
+    if (
+        isinstance(budget, bool)
+        or not isinstance(budget, (int, float))
+        or budget <= 0
+    ):
+        raise ConfigurationError('"PROFILE.budget" must be a positive number')
+
+    return profile
+
+
+def validate_diff_cache_config(tests_module: object) -> dict[str, Any]:
+    """
+    Validates the optional DIFF_CACHE variable.
+
+    Raises:
+        ConfigurationError: If DIFF_CACHE is not a dictionary, "size" is not
+            a positive integer, or "persist" is not a boolean.
+    """
+
+    config = getattr(tests_module, "DIFF_CACHE", None)
+    if config is None:
+        return dict(DEFAULT_DIFF_CACHE)
+
+    if not isinstance(config, dict):
+        raise ConfigurationError('"DIFF_CACHE" must be a dictionary')
+
+    diff_cache = {**DEFAULT_DIFF_CACHE, **cast(dict[str, Any], config)}
+    for key in diff_cache:
+        if key not in DEFAULT_DIFF_CACHE:
+            raise ConfigurationError(
+                f'"DIFF_CACHE.{key}" is not a supported option'
+            )
+
+    size = diff_cache["size"]
+    if isinstance(size, bool) or not isinstance(size, int) or size <= 0:
+        raise ConfigurationError(
+            '"DIFF_CACHE.size" must be a positive integer'
+        )
+
+    if not isinstance(diff_cache["persist"], bool):
+        raise ConfigurationError('"DIFF_CACHE.persist" must be a boolean')
+
+    return diff_cache
+
+
+def validate_jvm_pool_config(tests_module: object) -> dict[str, Any] | None:
+    """
+    Validates the optional JVM_POOL variable.
+
+    Raises:
+        ConfigurationError: If JVM_POOL is not a dictionary or "size" is not
+            a positive integer.
+    """
+
+    config = getattr(tests_module, "JVM_POOL", None)
+    if config is None:
+        return None
+
+    if not isinstance(config, dict):
+        raise ConfigurationError('"JVM_POOL" must be a dictionary')
+
+    jvm_pool = {**DEFAULT_JVM_POOL, **cast(dict[str, Any], config)}
+    for key in jvm_pool:
+        if key not in DEFAULT_JVM_POOL:
+            raise ConfigurationError(
+                f'"JVM_POOL.{key}" is not a supported option'
+            )
+
+    size = jvm_pool["size"]
+    if isinstance(size, bool) or not isinstance(size, int) or size <= 0:
+        raise ConfigurationError('"JVM_POOL.size" must be a positive integer')
+
+    return jvm_pool
+
+
+def validate_timeout_policy(tests_module: object) -> dict[str, Any] | None:
+    """
+    Validates the optional TIMEOUT_POLICY variable.
+
+    Raises:
+        ConfigurationError: If TIMEOUT_POLICY is not a dictionary, "factor",
+            "floor", or "cap" is not a positive number, "cap" is less than
+            "floor", or "source" is not "run" or "calibration".
+    """
+
+    config = getattr(tests_module, "TIMEOUT_POLICY", None)
+    if config is None:
+        return None
+
+    if not isinstance(config, dict):
+        raise ConfigurationError('"TIMEOUT_POLICY" must be a dictionary')
+
+    policy = {**DEFAULT_TIMEOUT_POLICY, **cast(dict[str, Any], config)}
+    for key in policy:
+        if key not in DEFAULT_TIMEOUT_POLICY:
+            raise ConfigurationError(
+                f'"TIMEOUT_POLICY.{key}" is not a supported option'
+            )
+
+    for key in ("factor", "floor", "cap"):
+        value = policy[key]
+        if (
+            isinstance(value, bool)
+            or not isinstance(value, (int, float))
+            or value <= 0
+        ):
+            raise ConfigurationError(
+                f'"TIMEOUT_POLICY.{key}" must be a positive number'
+            )
+
+    if policy["cap"] < policy["floor"]:
+        raise ConfigurationError(
+            '"TIMEOUT_POLICY.cap" must not be less than "TIMEOUT_POLICY.floor"'
+        )
+
+    if policy["source"] not in ("run", "calibration"):
+        raise ConfigurationError(
+            '"TIMEOUT_POLICY.source" must be "run" or "calibration"'
+        )
+
+    return policy
+
+
+def validate_custom_stages(tests_module: object) -> list[Stage]:
+    """
+    Validates the optional STAGES variable, a list of custom checks that run
+    as additional pipeline stages.
+
+    Raises:
+        ConfigurationError: If STAGES is not a list or tuple, or any stage
+            does not conform to (name, function, dependencies).
+    """
+
+    stages = getattr(tests_module, "STAGES", None)
+    if stages is None:
+        return []
+
+    if not isinstance(stages, (list, tuple)):
+        raise ConfigurationError(
+            "STAGES variable must be a list or tuple of stage configurations."
+        )
+
+    stages = cast(list[Any], stages)
+    validated: list[Stage] = []
+    for i, stage in enumerate(stages):
+        if not (isinstance(stage, (list, tuple)) and len(stage) == 3):
+            raise ConfigurationError(
+                f'Invalid stage configuration for stage "{i}", must be (name, function, dependencies)'
+            )
+
+        name, func, depends_on = cast(tuple[Any, Any, Any], stage)
+        if not (
+            isinstance(name, str)
+            and callable(func)
+            and isinstance(depends_on, (list, tuple))
+            and all(isinstance(d, str) for d in depends_on)  # type: ignore
+        ):
+            raise ConfigurationError(
+                f'Invalid stage configuration for stage "{i}", must be (name, function, dependencies)'
+            )
+
+        if name in BUILT_IN_STAGES:
+            raise ConfigurationError(
+                f'Invalid stage configuration for stage "{i}", "{name}" is a built-in stage name'
+            )
+
+        depends_on = tuple(cast(list[str], depends_on))
+        validated.append(
+            Stage(name, wrap_custom_stage(func, depends_on), depends_on)
+        )
+
+    return validated
+
+
+def wrap_custom_stage(
+    func: Callable[[dict[str, Any]], Any], depends_on: tuple[str, ...]
+) -> Callable[[StageResults], Any]:
+    """
+    Adapts a custom stage function, which receives a plain dictionary with
+    the results of its dependencies, to the pipeline.
+    """
+
+    def stage_func(results: StageResults) -> Any:
+        return func({name: results[name] for name in depends_on})
+
+    return stage_func
+
+
+def validate_custom_stage_output(
+    stage: Stage, output: Any
+) -> list[dict[str, Any]]:
+    """
+    Normalizes the output of a custom stage to a list of Gradescope tests.
+
+    Raises:
+        ConfigurationError: If the output is not None, a dictionary, or a
+            list of dictionaries with a max_score.
+    """
+
+    if output is None:
+        return []
+
+    tests = [output] if isinstance(output, dict) else output
+    if not isinstance(tests, (list, tuple)) or not all(
+        isinstance(test, dict) and "max_score" in test
+        for test in cast(list[Any], tests)
+    ):
+        raise ConfigurationError(
+            f'The stage "{stage.name}" must return None, a test dictionary, or a list of test dictionaries, each with a max_score.'
+        )
+
+    return list(cast(list[dict[str, Any]], tests))
 
 
 def validate_entry_point(tests_module: object) -> str:
@@ -175,7 +1106,9 @@ def validate_entry_point(tests_module: object) -> str:
     return reference_file_name
 
 
-def write_results(results: dict[str, Any]) -> None:
+def write_results(
+    results: dict[str, Any], file_name: str = "results.json"
+) -> None:
     """
     Write results to the results JSON file.
     """
@@ -183,7 +1116,7 @@ def write_results(results: dict[str, Any]) -> None:
     absolute_results_path = find_absolute_path(RESULTS_DIR)
     results_dir = Path(absolute_results_path)
     results_dir.mkdir(parents=True, exist_ok=True)
-    with open(results_dir / "results.json", "w") as results_file:
+    with open(results_dir / file_name, "w") as results_file:
         json.dump(results, results_file)
 
-    print(f'Results written to "{results_dir / "results.json"}".')
+    print(f'Results written to "{results_dir / file_name}".')
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from statistics import median
+from typing import Any, TypeVar, cast
+
+from .helpers import (
+    RESULTS_DIR,
+    ConfigurationError,
+    find_absolute_path,
+    fingerprint,
+)
+
+T = TypeVar("T")
+
+TIMINGS_FILE_NAME = "timings.json"
+# Cost in seconds of a test without a recorded timing, if none are recorded
+DEFAULT_TEST_COST = 1.0
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parses a shard written as "i/n", the i-th of n shards starting at 1.
+
+    Raises:
+        ConfigurationError: If the value is not two integers with
+            1 <= i <= n.
+    """
+
+    match = re.fullmatch(r"(\d+)/(\d+)", value.strip())
+    if match is None:
+        raise ConfigurationError(
+            f'Invalid shard "{value}", must be written as "i/n", like "1/4".'
+        )
+
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ConfigurationError(
+            f'Invalid shard "{value}", i must be between 1 and n.'
+        )
+
+    return index, count
+
+
+def shard_file_name(shard: tuple[int, int]) -> str:
+    return f"shard_{shard[0]}_of_{shard[1]}.json"
+
+
+def select_shard(
+    tests: list[T], shard: tuple[int, int], timings: dict[str, float]
+) -> list[tuple[int, T]]:
+    """
+    Returns the tests of the shard with their indices in `tests`.
+
+    Tests are spread with the longest processing time first heuristic, using
+    the recorded timings and the median timing for unknown tests, so every
+    shard computes the same split and the shards take similar times.
+    """
+
+    index, count = shard
+    costs = [timings.get(fingerprint(test), None) for test in tests]
+    known_costs = [cost for cost in costs if cost is not None]
+    default_cost = median(known_costs) if known_costs else DEFAULT_TEST_COST
+
+    loads = [0.0] * count
+    assigned: list[list[int]] = [[] for _ in range(count)]
+    by_cost = sorted(
+        range(len(tests)),
+        key=lambda i: (-(costs[i] or default_cost), i),
+    )
+    for i in by_cost:
+        target = min(range(count), key=lambda s: (loads[s], s))
+        loads[target] += costs[i] or default_cost
+        assigned[target].append(i)
+
+    return [(i, tests[i]) for i in sorted(assigned[index - 1])]
+
+
+def read_timings() -> dict[str, float]:
+    """
+    Reads the per test timings recorded by previous runs, if any.
+    """
+
+    timings_path = Path(find_absolute_path(RESULTS_DIR)) / TIMINGS_FILE_NAME
+    if not timings_path.exists():
+        return {}
+
+    try:
+        with open(timings_path, "r") as timings_file:
+            return json.load(timings_file)
+
+    except (OSError, ValueError):
+        return {}
+
+
+def write_timings(timings: dict[str, float]) -> None:
+    """
+    Records per test timings on top of the ones of previous runs.
+    """
+
+    timings_path = Path(find_absolute_path(RESULTS_DIR)) / TIMINGS_FILE_NAME
+    all_timings = {**read_timings(), **timings}
+    # Replaced atomically, so concurrent shards never read a partial file
+    temporary_path = timings_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(temporary_path, "w") as timings_file:
+        json.dump(all_timings, timings_file)
+
+    os.replace(temporary_path, timings_path)
+
+
+def merge_shards(shard_paths: list[str]) -> dict[str, Any]:
+    """
+    Combines the partial results of `autograder run --shard` into results
+    with the tests in their original order, and summed execution times and
+    JVM launch counts.
+
+    Raises:
+        ConfigurationError: If the files are not all the shards of one run.
+    """
+
+    if not shard_paths:
+        raise ConfigurationError("No shard results to merge.")
+
+    shards: list[dict[str, Any]] = []
+    for path in shard_paths:
+        try:
+            with open(path, "r") as shard_file:
+                shard = json.load(shard_file)
+
+        except (OSError, ValueError) as e:
+            raise ConfigurationError(
+                f'Could not read shard results "{path}": {e}'
+            )
+
+        if not is_shard_results(shard):
+            raise ConfigurationError(
+                f'"{path}" is not the results of `autograder run --shard`.'
+            )
+
+        shards.append(shard)
+
+    counts = {shard["shard"][1] for shard in shards}
+    indices = sorted(shard["shard"][0] for shard in shards)
+    count = next(iter(counts))
+    if len(counts) != 1 or indices != list(range(1, count + 1)):
+        raise ConfigurationError(
+            f"Expected every shard of the same run exactly once, but got shards {indices} of {sorted(counts)}."
+        )
+
+    shards.sort(key=lambda shard: shard["shard"][0])
+    indexed_tests: list[tuple[int, dict[str, Any]]] = []
+    other_tests: list[dict[str, Any]] = []
+    timings: dict[str, float] = {}
+    launch_stats: dict[str, int] = defaultdict(int)
+    for shard in shards:
+        tests = cast(list[dict[str, Any]], shard["tests"])
+        test_indices = cast(list[int], shard["test_indices"])
+        indexed_tests.extend(zip(test_indices, tests))
+        other_tests.extend(tests[len(test_indices) :])
+        timings.update(shard.get("timings", {}))
+        extra_data = shard.get("extra_data", None) or {}
+        for name, value in (extra_data.get("launches", None) or {}).items():
+            launch_stats[name] += value
+
+    write_timings(timings)
+    return {
+        "execution_time": sum(shard["execution_time"] for shard in shards),
+        "stdout_visibility": shards[0].get("stdout_visibility", "visible"),
+        "tests": [
+            test for _, test in sorted(indexed_tests, key=lambda t: t[0])
+        ]
+        + other_tests,
+        "extra_data": {"launches": dict(launch_stats)},
+    }
+
+
+def is_shard_results(shard: Any) -> bool:
+    """
+    Returns whether `shard` has the shape of the results of one shard: its
+    "shard" index and count, its tests, the indices in TESTS of the leading
+    ones, and its execution time.
+    """
+
+    if not isinstance(shard, dict):
+        return False
+
+    index_and_count = shard.get("shard", None)
+    tests = shard.get("tests", None)
+    test_indices = shard.get("test_indices", None)
+    return (
+        isinstance(index_and_count, list)
+        and len(index_and_count) == 2
+        and all(type(value) is int for value in index_and_count)
+        and isinstance(tests, list)
+        and all(isinstance(test, dict) for test in tests)
+        and isinstance(test_indices, list)
+        and all(type(index) is int for index in test_indices)
+        and len(test_indices) <= len(tests)
+        and isinstance(shard.get("execution_time", None), (int, float))
+        and isinstance(shard.get("timings", {}), dict)
+    )
@@ -1,17 +1,48 @@
+import os
 import shlex
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, partial
+from math import inf
 from pathlib import Path
-from subprocess import run
-from typing import Any, Callable, cast
+from shutil import rmtree
+from subprocess import CompletedProcess
+from threading import Lock
+from time import time
+from typing import Any, Callable, Iterable, Iterator, TypeVar, cast
 
+from .diff_cache import DiffCache, is_pure, output_digest
 from .helpers import (
     ConfigurationError,
-    time_limited_execution,
+    fingerprint,
+    time_limited_run,
     timed_execution,
 )
+from .isolation import IsolationPool, isolate_function
+from .jvm_pool.jvm_pool import JvmPool, available_cores
+from .output_files import compare_output_files, prepare_work_dir
+from .profiling import (
+    RECORDING_GRACE_PERIOD,
+    dump_recording,
+    format_profile,
+    recording_options,
+    summarize_recording,
+)
+from .timeouts import adaptive_timeout
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Number of distinct invocations per side whose outputs are kept for reuse.
+INVOCATION_CACHE_SIZE = 1024
+# Runs of each invocation when calibrating, the fastest one is kept
+CALIBRATION_RUNS = 3
+# Outputs, time, and working directory of a program run
+Run = tuple[str, str, float, str | None]
 
 
 def run_tests(
-    tests: list[
+    tests: Iterable[
         tuple[str, dict[str, Any]]
         | tuple[
             str,
@@ -21,52 +52,662 @@ def run_tests(
     ],
     reference_file_path: str,
     submission_file_path: str,
+    wait_for_submission: Callable[[], Any] | None = None,
+    diff_limits: dict[str, int] | None = None,
+    result_cache: dict[str, dict[str, Any]] | None = None,
+    timings: dict[str, float] | None = None,
+    profile: dict[str, Any] | None = None,
+    records: list[dict[str, Any]] | None = None,
+    timeout_policy: dict[str, Any] | None = None,
+    diff_cache: DiffCache | None = None,
+    jvm_pool: JvmPool | None = None,
+    reference_classpath: str | None = None,
+    submission_classpath: str | None = None,
+    isolation_pool: IsolationPool | None = None,
+    launch_stats: dict[str, int] | None = None,
 ) -> tuple[float, list[dict[str, Any]]]:
     """
     Run tests on the student's Java submission using the reference solution
-    implementation.
+    implementation, loading each side's classes from its classpath.
+
+    Reference runs start ahead of the student runs, and tests are scored
+    while the next ones run. Tests found in `result_cache` are not run.
 
     Raises:
         ConfigurationError: If the reference solution fails to run for any
         test or the test configuration setup is invalid
     """
 
-    results: list[dict[str, Any]] = []
+    work_dirs = WorkDirs()
+
+    # Tests sharing an invocation (args, stdin, env, and output files) only
+    # launch the JVM once per side, their outputs are reused for every
+    # dependent test. The caches are bounded so lazily generated suites keep
+    # a flat memory use.
+    @lru_cache(maxsize=INVOCATION_CACHE_SIZE)
+    def run_reference_invocation(
+        args: str,
+        stdin: str | None,
+        env: tuple[tuple[str, str], ...],
+        output_files: tuple[str, ...],
+    ) -> Run:
+        return run_invocation(
+            reference_file_path,
+            reference_classpath,
+            work_dirs,
+            jvm_pool,
+            (args, stdin, env, output_files),
+        )
+
+    @lru_cache(maxsize=INVOCATION_CACHE_SIZE)
+    def run_student_invocation(
+        args: str,
+        stdin: str | None,
+        env: tuple[tuple[str, str], ...],
+        output_files: tuple[str, ...],
+        timeout: float | None,
+    ) -> Run:
+        return run_invocation(
+            submission_file_path,
+            submission_classpath,
+            work_dirs,
+            jvm_pool,
+            (args, stdin, env, output_files),
+            timeout=timeout,
+        )
+
+    # Slow runs are recorded in a second run once grading is done, so the
+    # recorder's startup time never counts against the student's time limit.
+    def profile_invocation(
+        key: tuple[Any, ...], time_limit: float
+    ) -> dict[str, Any]:
+        assert profile is not None
+        recording = str(Path(profile["dir"]) / f"{fingerprint(key)}.jfr")
+        run_invocation(
+            submission_file_path,
+            submission_classpath,
+            work_dirs,
+            jvm_pool,
+            key,
+            timeout=time_limit,
+            recording_path=recording,
+        )
+        return summarize_recording(recording, profile["top"])
+
+    def run_reference(
+        test: tuple[str, dict[str, Any]]
+        | tuple[str, Callable[[str, str], tuple[float, str]], dict[str, Any]],
+    ) -> Run | None:
+        if result_cache is not None and fingerprint(test) in result_cache:
+            return None
+
+        args, _, kwargs = unpack_test(test)
+        key = invocation_key(args, kwargs)
+        reference_run, _ = work_dirs.acquire(
+            run_reference_invocation(*key),
+            partial(run_reference_invocation.__wrapped__, *key),
+        )
+        return reference_run
+
+    def run_student(key: tuple[Any, ...]) -> tuple[Run, bool]:
+        """
+        Returns the student run of a test, and whether it launched a JVM.
+        """
+
+        launches = run_student_invocation.cache_info().misses
+        student_run, relaunched = work_dirs.acquire(
+            run_student_invocation(*key),
+            partial(run_student_invocation.__wrapped__, *key),
+        )
+        return student_run, (
+            relaunched or run_student_invocation.cache_info().misses > launches
+        )
+
+    warm_jvm(jvm_pool, reference_file_path, reference_classpath)
+    if wait_for_submission is None:
+        warm_jvm(jvm_pool, submission_file_path, submission_classpath)
+
+    keyed = (
+        result_cache is not None
+        or timings is not None
+        or records is not None
+        or timeout_policy is not None
+        or diff_cache is not None
+    )
+    diff_limits = diff_limits or {}
+    results: list[Future[dict[str, Any]]] = []
+    fingerprints: list[str] = []
+    slow_tests: list[tuple[int, tuple[Any, ...], float]] = []
+    timeouts: list[tuple[int, float | None]] = []
+    diff_identities: dict[Callable[[str, str], Any], str] = {}
+    diff_hits = 0 if diff_cache is None else diff_cache.hits
+    reused_results = 0
     total_run_time = 0
-    for i, test in enumerate(tests):
-        args = None
-        diff_func = None
-        kwargs: dict[str, Any] = {}
-        if len(test) == 3:
-            args, diff_func, kwargs = test
+    # Scoring, including custom diff functions, overlaps with the next runs
+    try:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as scoring:
+            # Reference runs go ahead on the spare cores only, on a single
+            # core each one runs right before its student run
+            reference_runs = prefetch(
+                run_reference, tests, available_cores() - 1
+            )
+            for i, (test, reference_run) in enumerate(reference_runs):
+                args, diff_func, kwargs = unpack_test(test)
+                test_fingerprint = fingerprint(test) if keyed else ""
+                fingerprints.append(test_fingerprint)
+                if reference_run is None:
+                    assert result_cache is not None
+                    cached_result: Future[dict[str, Any]] = Future()
+                    cached_result.set_result(result_cache[test_fingerprint])
+                    results.append(cached_result)
+                    reused_results += 1
+                    continue
+
+                check_reference_run(i, kwargs, reference_run)
+                reference_output, _, reference_time, reference_dir = (
+                    reference_run
+                )
+                if wait_for_submission is not None:
+                    wait_for_submission()
+                    wait_for_submission = None
+                    warm_jvm(
+                        jvm_pool, submission_file_path, submission_classpath
+                    )
+
+                timeout = resolve_timeout(
+                    kwargs, timeout_policy, reference_time, test_fingerprint
+                )
+                timeouts.append((len(results), timeout))
+                key = (*invocation_key(args, kwargs), timeout)
+                student_run, launched = run_student(key)
+                student_output, student_error, execution_time, student_dir = (
+                    student_run
+                )
+                if launched:
+                    total_run_time += execution_time
+
+                if timings is not None:
+                    timings[test_fingerprint] = reference_time + execution_time
+
+                timed_out = timeout is not None and execution_time >= timeout
+                if records is not None:
+                    records.append(
+                        history_record(
+                            len(results),
+                            test_fingerprint,
+                            kwargs.get("name", args),
+                            student_run,
+                            timed_out,
+                        )
+                    )
+
+                if is_slow(profile, timeout, execution_time, timed_out):
+                    slow_tests.append((len(results), key, execution_time))
+
+                if diff_func is not None:
+                    test_name = kwargs.get("name", "<no name>")
+                    diff_func = prepare_diff_function(
+                        diff_func,
+                        f'The diff function {diff_func} on test ({i}) "{test_name}"',
+                        diff_limits,
+                        isolation_pool,
+                        diff_cache,
+                        diff_identities,
+                        test_fingerprint,
+                    )
+
+                result = scoring.submit(
+                    compile_test_results,
+                    reference_output,
+                    student_output,
+                    student_error,
+                    diff_func,
+                    kwargs,
+                    (reference_dir, student_dir)
+                    if kwargs.get("output_files")
+                    else None,
+                )
+                # Output files are compared while scoring, so the working
+                # directories are only released once it is done
+                result.add_done_callback(
+                    partial(work_dirs.release, (reference_dir, student_dir))
+                )
+                results.append(result)
+
+            test_results = [result.result() for result in results]
+
+        for i, timeout in timeouts:
+            test_results[i].setdefault("extra_data", {})["timeout"] = timeout
+
+        if profile is not None:
+            add_profiles(test_results, slow_tests, profile, profile_invocation)
+
+    finally:
+        # Directories still in use when grading failed, or written by
+        # profiling reruns
+        work_dirs.clean()
+
+    for record in records or []:
+        score_record(record, test_results[record.pop("index")])
+
+    if result_cache is not None:
+        result_cache.clear()
+        result_cache.update(zip(fingerprints, test_results))
+
+    if launch_stats is not None:
+        launches = (
+            run_reference_invocation.cache_info().misses
+            + run_student_invocation.cache_info().misses
+            + work_dirs.relaunches
+        )
+        ran_tests = len(test_results) - reused_results
+        launch_stats.update(
+            ran_tests=ran_tests,
+            reused_tests=reused_results,
+            launches=launches,
+            saved_launches=2 * ran_tests - launches,
+        )
+
+    if diff_cache is not None and diff_cache.hits > diff_hits:
+        print(
+            f"Reused {diff_cache.hits - diff_hits} diff function results for outputs already scored."
+        )
+
+    return total_run_time, test_results
+
+
+class WorkDirs:
+    """
+    Working directories of the runs writing output files. Each one is
+    deleted as soon as the tests using it are scored, so disk use stays
+    bounded by the tests in flight.
+    """
+
+    def __init__(self) -> None:
+        self.created: list[str] = []
+        self.users: dict[str, int] = {}
+        self.lock = Lock()
+        self.relaunches = 0
+
+    def create(self, side_dir: str, output_files: tuple[str, ...]) -> str:
+        work_dir = prepare_work_dir(side_dir, output_files)
+        with self.lock:
+            self.created.append(work_dir)
+            self.users[work_dir] = 0
+
+        return work_dir
 
-        elif len(test) == 2:
-            args, kwargs = test
-            diff_func = None
+    def acquire(self, run: Run, rerun: Callable[[], Run]) -> tuple[Run, bool]:
+        """
+        Marks a run's working directory as used by one more test. A reused
+        run whose directory was already deleted is run again, returning
+        True with it.
+        """
 
-        assert args is not None
+        work_dir = run[3]
+        if work_dir is None:
+            return run, False
 
-        reference_output, reference_error, _ = run_java_code(
-            reference_file_path, args
+        with self.lock:
+            if work_dir in self.users:
+                self.users[work_dir] += 1
+                return run, False
+
+            self.relaunches += 1
+
+        return self.acquire(rerun(), rerun)[0], True
+
+    def release(self, dirs: tuple[str | None, ...], _: Future[Any]) -> None:
+        for work_dir in dirs:
+            if work_dir is None:
+                continue
+
+            with self.lock:
+                self.users[work_dir] -= 1
+                if self.users[work_dir]:
+                    continue
+
+                del self.users[work_dir]
+
+            rmtree(work_dir, ignore_errors=True)
+
+    def clean(self) -> None:
+        for work_dir in self.created:
+            rmtree(work_dir, ignore_errors=True)
+
+
+def run_invocation(
+    file_path: str,
+    classpath: str | None,
+    work_dirs: WorkDirs,
+    jvm_pool: JvmPool | None,
+    key: tuple[Any, ...],
+    **kwargs: Any,
+) -> Run:
+    """
+    Runs a program on an invocation key, returning its outputs, time, and
+    working directory.
+    """
+
+    args, stdin, env, output_files = key
+    # Runs writing output files get their own working directory, so parallel
+    # runs of both sides never write over each other's files
+    work_dir = None
+    if output_files:
+        work_dir = work_dirs.create(str(Path(file_path).parent), output_files)
+
+    stdout, stderr, execution_time = run_java_code(
+        file_path,
+        args,
+        stdin=stdin,
+        env=dict(env) or None,
+        classpath=classpath,
+        cwd=work_dir,
+        jvm_pool=jvm_pool,
+        **kwargs,
+    )
+    return stdout, stderr, execution_time, work_dir
+
+
+def warm_jvm(
+    jvm_pool: JvmPool | None, file_path: str, classpath: str | None
+) -> None:
+    if jvm_pool is not None:
+        side_dir = str(Path(file_path).parent)
+        jvm_pool.warm(classpath or side_dir, side_dir, Path(file_path).stem)
+
+
+def check_reference_run(i: int, kwargs: dict[str, Any], run: Run) -> None:
+    """
+    Raises:
+        ConfigurationError: If the reference solution failed on the test or
+            did not write one of its output files
+    """
+
+    _, reference_error, _, reference_dir = run
+    test_name = kwargs.get("name", "<no name>")
+    if reference_error:
+        raise ConfigurationError(
+            f'The reference solution code failed to run on test ({i}) "{test_name}" with error:\n\n{reference_error}'
         )
-        if reference_error:
-            test_name = kwargs.get("name", "<no name>")
+
+    for output_file in kwargs.get("output_files") or []:
+        assert reference_dir is not None
+        if not (Path(reference_dir) / output_file).is_file():
             raise ConfigurationError(
-                f'The reference solution code failed to run on test ({i}) "{test_name}" with error:\n\n{reference_error}'
+                f'The reference solution did not write the output file "{output_file}" on test ({i}) "{test_name}".'
             )
 
-        timeout = kwargs.get("timeout", 1)
-        student_output, student_error, execution_time = run_java_code(
-            submission_file_path, args, timeout=timeout
-        )
-        total_run_time += execution_time
 
-        result = compile_test_results(
-            reference_output, student_output, student_error, diff_func, kwargs
+def resolve_timeout(
+    kwargs: dict[str, Any],
+    timeout_policy: dict[str, Any] | None,
+    reference_time: float,
+    test_fingerprint: str,
+) -> float | None:
+    """
+    Returns a test's own timeout, or else the one the timeout policy derives
+    from the reference time, stored or measured in this run.
+    """
+
+    # An explicit None means no time limit
+    if "timeout" in kwargs or timeout_policy is None:
+        return kwargs.get("timeout", 1)
+
+    reference_times = timeout_policy["reference_times"]
+    return adaptive_timeout(
+        reference_times.get(test_fingerprint, reference_time), timeout_policy
+    )
+
+
+def history_record(
+    index: int,
+    test_fingerprint: str,
+    name: str,
+    student_run: Run,
+    timed_out: bool,
+) -> dict[str, Any]:
+    """
+    Returns the run history record of a student run, scored once the test
+    results are compiled.
+    """
+
+    student_output, student_error, execution_time, _ = student_run
+    status = "error" if student_error else None
+    return {
+        "index": index,
+        "test": test_fingerprint,
+        "name": name,
+        "duration": execution_time,
+        "status": "timeout" if timed_out else status,
+        "stdout_size": len(student_output),
+        "stderr_size": len(student_error),
+        "output_hash": output_digest(student_output),
+    }
+
+
+def score_record(record: dict[str, Any], test_result: dict[str, Any]) -> None:
+    record["status"] = record["status"] or test_result["status"]
+    record["score"] = test_result["score"]
+    record["max_score"] = test_result["max_score"]
+
+
+def is_slow(
+    profile: dict[str, Any] | None,
+    timeout: float | None,
+    execution_time: float,
+    timed_out: bool,
+) -> bool:
+    """
+    Returns whether a student run timed out or took at least the profile's
+    "slow" seconds, its timeout by default.
+    """
+
+    if profile is None:
+        return False
+
+    slow = profile["slow"] or timeout
+    return timed_out or (slow is not None and execution_time >= slow)
+
+
+def prepare_diff_function(
+    diff_func: Callable[[str, str], tuple[float, str]],
+    description: str,
+    diff_limits: dict[str, int],
+    isolation_pool: IsolationPool | None,
+    diff_cache: DiffCache | None,
+    diff_identities: dict[Callable[[str, str], Any], str],
+    test_fingerprint: str,
+) -> Callable[[str, str], tuple[float, str]]:
+    """
+    Isolates a test's diff function within `diff_limits`, reusing the
+    results of pure ones from `diff_cache`.
+    """
+
+    if is_pure(diff_func) and diff_func not in diff_identities:
+        diff_identities[diff_func] = fingerprint(diff_func)
+
+    identity = diff_identities.get(diff_func, None)
+    isolated = isolate_function(
+        diff_func,
+        description,
+        diff_limits.get("timeout", None),
+        diff_limits.get("memory", None),
+        isolation_pool,
+    )
+    if diff_cache is None or identity is None:
+        return isolated
+
+    return diff_cache.memoize(isolated, test_fingerprint, identity)
+
+
+def add_profiles(
+    test_results: list[dict[str, Any]],
+    slow_tests: list[tuple[int, tuple[Any, ...], float]],
+    profile: dict[str, Any],
+    profile_invocation: Callable[[tuple[Any, ...], float], dict[str, Any]],
+) -> None:
+    """
+    Profiles the slowest distinct slow runs within the profiling budget, and
+    adds their summaries to the results of the tests that ran them.
+    """
+
+    # Every profiled run takes up to its time limit again, plus the
+    # recorder's overhead
+    slow_runs = {key: run_time for _, key, run_time in slow_tests}
+    summaries: dict[tuple[Any, ...], dict[str, Any]] = {}
+    deadline = time() + profile["budget"]
+    for key in sorted(slow_runs, key=slow_runs.__getitem__, reverse=True)[
+        : profile["max_runs"]
+    ]:
+        time_limit = deadline - time()
+        if time_limit <= 0:
+            break
+
+        if key[-1] is not None:
+            time_limit = min(time_limit, key[-1] + RECORDING_GRACE_PERIOD)
+
+        summaries[key] = profile_invocation(key[:-1], time_limit)
+
+    if len(slow_runs) > len(summaries):
+        print(
+            f"Profiled the {len(summaries)} slowest of {len(slow_runs)} slow runs, raise PROFILE.max_runs or PROFILE.budget to profile more."
         )
-        results.append(result)
 
-    return total_run_time, results
+    for i, key, _ in slow_tests:
+        summary = summaries.get(key, None)
+        if summary is None:
+            continue
+
+        test_results[i].setdefault("extra_data", {})["profile"] = summary
+        if profile["feedback"]:
+            test_results[i]["output"] += (
+                f"\n\nProfile:\n\n{format_profile(summary)}"
+            )
+
+
+def time_reference(
+    tests: Iterable[
+        tuple[str, dict[str, Any]]
+        | tuple[
+            str,
+            Callable[[str, str], tuple[float, str]],
+            dict[str, Any],
+        ],
+    ],
+    reference_file_path: str,
+    reference_classpath: str | None = None,
+    runs: int = CALIBRATION_RUNS,
+) -> dict[str, float]:
+    """
+    Returns the fastest of `runs` times of the reference solution on every
+    test by fingerprint. Only one program runs at a time, so the times are
+    not inflated by runs competing for the cores.
+
+    Raises:
+        ConfigurationError: If the reference solution fails to run for any
+        test
+    """
+
+    invocation_times: dict[tuple[Any, ...], float] = {}
+    reference_times: dict[str, float] = {}
+    for i, test in enumerate(tests):
+        args, _, kwargs = unpack_test(test)
+        key = invocation_key(args, kwargs)
+        if key not in invocation_times:
+            fastest = inf
+            for _ in range(runs):
+                work_dir = None
+                if key[3]:
+                    work_dir = prepare_work_dir(
+                        str(Path(reference_file_path).parent), key[3]
+                    )
+
+                try:
+                    _, reference_error, reference_time = run_java_code(
+                        reference_file_path,
+                        args,
+                        stdin=key[1],
+                        env=dict(key[2]) or None,
+                        classpath=reference_classpath,
+                        cwd=work_dir,
+                    )
+
+                finally:
+                    if work_dir is not None:
+                        rmtree(work_dir, ignore_errors=True)
+
+                if reference_error:
+                    test_name = kwargs.get("name", "<no name>")
+                    raise ConfigurationError(
+                        f'The reference solution code failed to run on test ({i}) "{test_name}" with error:\n\n{reference_error}'
+                    )
+
+                fastest = min(fastest, reference_time)
+
+            invocation_times[key] = fastest
+
+        reference_times[fingerprint(test)] = invocation_times[key]
+
+    return reference_times
+
+
+def unpack_test(
+    test: tuple[str, dict[str, Any]]
+    | tuple[str, Callable[[str, str], tuple[float, str]], dict[str, Any]],
+) -> tuple[
+    str, Callable[[str, str], tuple[float, str]] | None, dict[str, Any]
+]:
+    """
+    Unpack a validated test configuration into (args, diff_func, kwargs).
+    """
+
+    if len(test) == 3:
+        return test
+
+    args, kwargs = test
+    return args, None, kwargs
+
+
+def invocation_key(
+    args: str, kwargs: dict[str, Any]
+) -> tuple[str, str | None, tuple[tuple[str, str], ...], tuple[str, ...]]:
+    """
+    Identify a JVM launch, tests with equal keys produce the same outputs.
+    """
+
+    env: dict[str, str] = kwargs.get("env") or {}
+    return (
+        shlex.join(shlex.split(args.strip())),
+        kwargs.get("stdin"),
+        tuple(sorted(env.items())),
+        tuple(kwargs.get("output_files") or ()),
+    )
+
+
+def prefetch(
+    func: Callable[[T], R], items: Iterable[T], size: int
+) -> Iterator[tuple[T, R]]:
+    """
+    Lazily yield each item with `func(item)`, computing up to `size` items
+    ahead in a background thread.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    window: deque[tuple[T, Future[R]]] = deque()
+    try:
+        for item in items:
+            window.append((item, executor.submit(func, item)))
+            if len(window) > size:
+                item, future = window.popleft()
+                yield item, future.result()
+
+        while window:
+            item, future = window.popleft()
+            yield item, future.result()
+
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 
 def compile_test_results(
@@ -75,9 +716,14 @@ def compile_test_results(
     student_error: str,
     diff_func: Callable[[str, str], tuple[float, str]] | None,
     kwargs: dict[str, Any],
+    output_dirs: tuple[str, str] | None = None,
 ) -> dict[str, Any]:
     """
     Compile test results for Gradescope autograders.
+
+    With `output_dirs`, the (reference, student) working directories, the
+    output files the test declares are compared too. The score is scaled by
+    the fraction of matching files, and the test only passes if all match.
     """
 
     test_result = kwargs.copy()
@@ -151,23 +797,94 @@ def compile_test_results(
         if feedback:
             test_result["output"] += f"\n\nFeedback:\n\n{feedback}"
 
+    if output_dirs is not None:
+        comparisons = compare_output_files(
+            *output_dirs, tuple(kwargs["output_files"])
+        )
+        matched = sum(1 for _, file_matched, _ in comparisons if file_matched)
+        test_result["score"] *= matched / len(comparisons)
+        if matched < len(comparisons):
+            test_result["status"] = "failed"
+
+        file_feedback = "\n\n".join(feedback for _, _, feedback in comparisons)
+        test_result["output"] += f"\n\nOutput files:\n\n{file_feedback}"
+
     return test_result
 
 
 def run_java_code(
-    path: str, command_line_args: str, timeout: int | None = None
+    path: str,
+    command_line_args: str,
+    timeout: float | None = None,
+    stdin: str | None = None,
+    env: dict[str, str] | None = None,
+    recording_path: str | None = None,
+    classpath: str | None = None,
+    cwd: str | None = None,
+    jvm_pool: JvmPool | None = None,
 ) -> tuple[str, str, float]:
     """
-    Run a Java program given a compiled class file path and a command line arguments string.
+    Run a Java program given a source file path and a command line arguments string.
+
+    The program runs in a JVM from `jvm_pool` when it needs no special
+    launch, and with a `recording_path` it is recorded with the Java Flight
+    Recorder.
     """
 
     file_path = Path(path)
-    cwd = file_path.parent
     file_name = file_path.stem
-    cmd = ["java", file_name] + shlex.split(command_line_args.strip())
-
-    timed_run = timed_execution(time_limited_execution(timeout)(run))
-    result, execution_time = timed_run(cmd, capture_output=True, cwd=cwd)
+    input = None if stdin is None else stdin.encode("utf-8")
+    if (
+        jvm_pool is not None
+        and env is None
+        and cwd is None
+        and recording_path is None
+    ):
+        result, execution_time = jvm_pool.run(
+            classpath or str(file_path.parent),
+            str(file_path.parent),
+            file_name,
+            shlex.split(command_line_args.strip()),
+            input,
+            timeout,
+        )
+        return decode_result(result, execution_time)
+
+    options: list[str] = []
+    if classpath is not None:
+        options = ["-cp", classpath]
+
+    elif cwd is not None:
+        options = ["-cp", str(file_path.parent)]
+
+    on_timeout = None
+    if recording_path is not None:
+        options += recording_options(recording_path)
+        on_timeout = partial(dump_recording, recording_path=recording_path)
+
+    cmd = (
+        ["java"]
+        + options
+        + [file_name]
+        + shlex.split(command_line_args.strip())
+    )
+
+    timed_run = timed_execution(time_limited_run)
+    result, execution_time = timed_run(
+        cmd,
+        timeout,
+        on_timeout,
+        capture_output=True,
+        cwd=cwd or file_path.parent,
+        input=input,
+        env=None if env is None else {**os.environ, **env},
+    )
+    return decode_result(result, execution_time)
+
+
+def decode_result(
+    result: CompletedProcess[bytes] | TimeoutError, execution_time: float
+) -> tuple[str, str, float]:
     if isinstance(result, TimeoutError):
         return "", str(result), execution_time
 
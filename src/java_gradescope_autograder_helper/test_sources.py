@@ -0,0 +1,85 @@
+from random import Random
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+def parametrize(
+    args_template: str,
+    params: Iterable[Any],
+    diff_func: Callable[[str, str], tuple[float, str]] | None = None,
+    **kwargs: Any,
+) -> Iterator[
+    tuple[str, dict[str, Any]]
+    | tuple[str, Callable[[str, str], tuple[float, str]], dict[str, Any]]
+]:
+    """
+    Lazily generate one test per parameter by formatting `args_template`
+    and every string in `kwargs` (e.g. "name") with it.
+
+    Example:
+        parametrize("add {} {}", [(1, 2), (3, 4)], max_score=1,
+                    name="Evaluate {}+{}")
+    """
+
+    for param in params:
+        if isinstance(param, dict):
+            format_args: tuple[Any, ...] = ()
+            format_kwargs: dict[str, Any] = param  # type: ignore
+        elif isinstance(param, (tuple, list)):
+            format_args = tuple(param)  # type: ignore
+            format_kwargs = {}
+        else:
+            format_args = (param,)
+            format_kwargs = {}
+
+        test_kwargs = {
+            key: (
+                value.format(*format_args, **format_kwargs)
+                if isinstance(value, str)
+                else value
+            )
+            for key, value in kwargs.items()
+        }
+        args = args_template.format(*format_args, **format_kwargs)
+        if diff_func is None:
+            yield args, test_kwargs
+        else:
+            yield args, diff_func, test_kwargs
+
+
+def random_cases(
+    generate: Callable[[Random], T], count: int, seed: int = 0
+) -> Iterator[T]:
+    """
+    Lazily generate `count` parameters with `generate`, giving every case its
+    own random number generator seeded from `seed` and the case number, so
+    each case is reproducible on its own.
+
+    Example:
+        random_cases(lambda rng: (rng.randint(0, 9), rng.randint(0, 9)), 1000)
+    """
+
+    for i in range(count):
+        yield generate(Random(f"{seed}:{i}"))
+
+
+def sample(items: Iterable[T], size: int, seed: int = 0) -> list[T]:
+    """
+    Deterministically pick `size` of the items, keeping their original
+    order, while only holding `size` items in memory.
+    """
+
+    # Reservoir sampling (Algorithm R)
+    rng = Random(seed)
+    reservoir: list[tuple[int, T]] = []
+    for i, item in enumerate(items):
+        if i < size:
+            reservoir.append((i, item))
+            continue
+
+        j = rng.randint(0, i)
+        if j < size:
+            reservoir[j] = (i, item)
+
+    return [item for _, item in sorted(reservoir, key=lambda pair: pair[0])]
@@ -0,0 +1,100 @@
+import json
+from functools import lru_cache
+from math import inf
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from .helpers import ConfigurationError
+
+CALIBRATION_FILE_NAME = "calibration.json"
+# Rounds of the machine speed probe, the fastest one is kept since slower
+# rounds only measure interference from other processes
+PROBE_ROUNDS = 5
+PROBE_SIZE = 200_000
+
+
+def adaptive_timeout(reference_time: float, policy: dict[str, Any]) -> float:
+    """
+    Returns "factor" times the reference solution's time, kept between the
+    "floor" and "cap" seconds of the timeout policy.
+    """
+
+    timeout = reference_time * policy["factor"]
+    return round(min(max(timeout, policy["floor"]), policy["cap"]), 3)
+
+
+@lru_cache(maxsize=1)
+def machine_speed() -> float:
+    """
+    Returns the seconds a fixed CPU-bound workload takes on this machine, so
+    times measured on another machine can be scaled to this one.
+    """
+
+    fastest = inf
+    for _ in range(PROBE_ROUNDS):
+        start = perf_counter()
+        sum(i * i for i in range(PROBE_SIZE))
+        fastest = min(fastest, perf_counter() - start)
+
+    return fastest
+
+
+def write_calibration(
+    source_dir: str, sources: str, reference_times: dict[str, float]
+) -> None:
+    """
+    Writes the reference solution's time per test fingerprint, with the
+    speed of the machine that measured them, to the source directory so it
+    is zipped with the autograder.
+    """
+
+    calibration = {
+        "machine_speed": machine_speed(),
+        "sources": sources,
+        "reference_times": reference_times,
+    }
+    with open(Path(source_dir) / CALIBRATION_FILE_NAME, "w") as file:
+        json.dump(calibration, file, indent=2)
+
+
+def read_calibration(source_dir: str, sources: str) -> dict[str, float]:
+    """
+    Returns the calibrated reference times per test fingerprint, scaled to
+    this machine's speed. Tests missing from the calibration fall back to the
+    reference time measured while grading.
+
+    Raises:
+        ConfigurationError: If there is no calibration, it cannot be read, or
+            the reference solution changed since it was made.
+    """
+
+    calibration_path = Path(source_dir) / CALIBRATION_FILE_NAME
+    if not calibration_path.exists():
+        raise ConfigurationError(
+            f'"TIMEOUT_POLICY.source" is "calibration" but "{calibration_path}" does not exist, run `autograder calibrate` first.'
+        )
+
+    try:
+        with open(calibration_path, "r") as file:
+            calibration = json.load(file)
+
+        calibrated_speed = float(calibration["machine_speed"])
+        reference_times = dict(calibration["reference_times"])
+        calibrated_sources = calibration["sources"]
+
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ConfigurationError(
+            f'Could not read the calibration "{calibration_path}": {e}'
+        )
+
+    if calibrated_sources != sources:
+        raise ConfigurationError(
+            f'The reference solution changed since "{calibration_path}" was made, run `autograder calibrate` again.'
+        )
+
+    scale = machine_speed() / calibrated_speed
+    return {
+        test: float(seconds) * scale
+        for test, seconds in reference_times.items()
+    }
@@ -0,0 +1,182 @@
+import os
+import signal
+from datetime import datetime
+from pathlib import Path
+from time import sleep, time
+from traceback import print_exc
+from typing import Any
+
+from .helpers import (
+    SOURCE_DIR,
+    SUBMISSION_DIR,
+    ConfigurationError,
+    find_absolute_path,
+)
+from .run_autograder import IncrementalState, run_autograder
+
+# Seconds between checks for changed files
+POLL_INTERVAL = 0.25
+# Compiled classes are written next to the sources, so they are not changes
+# and plans only cache what the watched files already hold
+IGNORED_SUFFIXES = (".class", ".pyc", ".plan.json")
+IGNORED_DIRS = ("__pycache__",)
+# Programs may write files into the directories while they are graded, only
+# edits to these are still changes when they happen during grading
+SOURCE_SUFFIXES = (".java", ".py")
+
+
+def watch_autograder(tests_file_name: str) -> None:
+    """
+    Runs the autograder, then reruns it whenever a file in the source or
+    submission directories changes, until interrupted.
+
+    Only the side whose files changed is recompiled, and when only Python
+    files changed, only the tests whose configuration or diff function
+    changed are run again.
+    """
+
+    absolute_source_path = find_absolute_path(SOURCE_DIR)
+    absolute_submission_path = find_absolute_path(SUBMISSION_DIR)
+    state = IncrementalState()
+    snapshots = {
+        "reference": snapshot(absolute_source_path),
+        "submission": snapshot(absolute_submission_path),
+    }
+
+    paths = {
+        "reference": absolute_source_path,
+        "submission": absolute_submission_path,
+    }
+
+    def grade_and_absorb() -> None:
+        grade(tests_file_name, state)
+        for side, path in paths.items():
+            snapshots[side] = absorb_written_files(
+                snapshots[side], snapshot(path)
+            )
+
+    print("Watching for changes, press Ctrl+C to stop.")
+    # Stopped like by Ctrl+C, so the build directories are removed
+    previous_handler = signal.signal(signal.SIGTERM, stop)
+    try:
+        grade_and_absorb()
+        while True:
+            sleep(POLL_INTERVAL)
+            changed_sides: list[str] = []
+            tests_changed = False
+            for side, path in paths.items():
+                current = snapshot(path)
+                changed = set(current.items()) ^ set(snapshots[side].items())
+                snapshots[side] = current
+                changed_files = {file for file, _ in changed}
+                if any(not file.endswith(".py") for file in changed_files):
+                    changed_sides.append(side)
+
+                elif changed_files:
+                    tests_changed = True
+
+            if changed_sides:
+                state.invalidate(tuple(changed_sides))
+
+            if changed_sides or tests_changed:
+                grade_and_absorb()
+
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        # Also removes the build directories kept between runs
+        state.invalidate()
+
+
+def stop(signal_number: int, frame: Any) -> None:
+    raise KeyboardInterrupt
+
+
+def grade(tests_file_name: str, state: IncrementalState) -> None:
+    """
+    Runs the autograder once and prints a summary, reporting errors instead
+    of raising them so the watcher keeps running.
+    """
+
+    start = time()
+    try:
+        results = run_autograder(tests_file_name, state)
+
+    except ConfigurationError as e:
+        print(str(e))
+        print_summary_line("Failed, waiting for changes.")
+        return
+
+    except Exception:
+        print_exc()
+        print_summary_line("Failed, waiting for changes.")
+        return
+
+    launches = results["extra_data"]["launches"]
+    ran_tests = launches["ran_tests"]
+    total_tests = ran_tests + launches["reused_tests"]
+    print_summary_line(
+        f"{summarize(results)} (ran {ran_tests} of {total_tests} tests) in {time() - start:.2f}s."
+    )
+
+
+def summarize(results: dict[str, Any]) -> str:
+    tests: list[dict[str, Any]] = results["tests"]
+    passed = sum(1 for test in tests if test.get("status") == "passed")
+    score = sum(test.get("score", 0) for test in tests)
+    max_score = sum(test.get("max_score", 0) for test in tests)
+    return f"{passed}/{len(tests)} passed, score {score:g}/{max_score:g}"
+
+
+def print_summary_line(message: str) -> None:
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+
+
+def absorb_written_files(
+    before: dict[str, tuple[int, int]], after: dict[str, tuple[int, int]]
+) -> dict[str, tuple[int, int]]:
+    """
+    Returns the snapshot to compare the next changes against. Files written
+    while grading, like a program's output files, are taken as they are
+    after grading, so they do not trigger another regrade. Sources are taken
+    as they were before, so edits made while grading still do.
+    """
+
+    absorbed = {
+        file: stat
+        for file, stat in after.items()
+        if not file.endswith(SOURCE_SUFFIXES)
+    }
+    absorbed.update(
+        (file, stat)
+        for file, stat in before.items()
+        if file.endswith(SOURCE_SUFFIXES)
+    )
+    return absorbed
+
+
+def snapshot(directory: str) -> dict[str, tuple[int, int]]:
+    """
+    Returns the modification time and size of every relevant file under the
+    directory.
+    """
+
+    files: dict[str, tuple[int, int]] = {}
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+        for name in names:
+            if name.endswith(IGNORED_SUFFIXES):
+                continue
+
+            path = Path(root) / name
+            try:
+                stat = path.stat()
+
+            except FileNotFoundError:
+                continue
+
+            files[str(path)] = (stat.st_mtime_ns, stat.st_size)
+
+    return files